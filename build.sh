@@ -5,13 +5,9 @@ set -e
 echo "Building portfolio website..."
 
 # Run markdown → HTML
-python scripts/convert_writeups.py
+python scripts/convert_writeups.py --jobs 0
 
-# ✅ ADD THIS BLOCK (IMPORTANT)
-echo "Copying static assets..."
-
-rm -rf docs/assets/videos
-mkdir -p docs/assets/videos
-cp -r blog-src/assets/videos/* docs/assets/videos/
+# Remove post pages, images and videos no page links to any more
+python scripts/collect_garbage.py
 
 echo "Build completed successfully!"
@@ -0,0 +1,446 @@
+/**
+ * Blog Section JavaScript
+ * Handles theme toggle, sidebar toggle, and active link highlighting
+ */
+
+(function() {
+  'use strict';
+
+  // Icons are symbols in the inline sprite each page carries (written by
+  // scripts/icons.py, which also lists the ones used here)
+  function iconHTML(name) {
+    return '<i class="fas fa-' + name + '"><svg aria-hidden="true"><use href="#fa-' + name + '"></use></svg></i>';
+  }
+
+  // ===== THEME TOGGLE =====
+  const themeToggle = document.getElementById('theme-toggle');
+  
+  // Check for saved theme preference or default to dark theme
+  function getSavedTheme() {
+    return localStorage.getItem('blog-theme') || 'dark';
+  }
+  
+  // Apply theme to document
+  function applyTheme(theme) {
+    document.documentElement.setAttribute('data-theme', theme);
+    localStorage.setItem('blog-theme', theme);
+  }
+  
+  // Toggle theme
+  function toggleTheme() {
+    const currentTheme = document.documentElement.getAttribute('data-theme') || 'dark';
+    const newTheme = currentTheme === 'dark' ? 'light' : 'dark';
+    applyTheme(newTheme);
+  }
+  
+  // Initialize theme on page load
+  function initTheme() {
+    const savedTheme = getSavedTheme();
+    applyTheme(savedTheme);
+  }
+  
+  // Add event listener for theme toggle
+  if (themeToggle) {
+    themeToggle.addEventListener('click', toggleTheme);
+  }
+  
+  // Initialize theme
+  initTheme();
+
+
+  // ===== SIDEBAR TOGGLE (Mobile) =====
+  const sidebarToggle = document.getElementById('sidebar-toggle');
+  const sidebar = document.getElementById('blog-sidebar');
+  const sidebarOverlay = document.getElementById('sidebar-overlay');
+  
+  function openSidebar() {
+    if (sidebar) {
+      sidebar.classList.add('open');
+    }
+    if (sidebarOverlay) {
+      sidebarOverlay.classList.add('active');
+    }
+    document.body.style.overflow = 'hidden';
+  }
+  
+  function closeSidebar() {
+    if (sidebar) {
+      sidebar.classList.remove('open');
+    }
+    if (sidebarOverlay) {
+      sidebarOverlay.classList.remove('active');
+    }
+    document.body.style.overflow = '';
+  }
+  
+  function toggleSidebar() {
+    if (sidebar && sidebar.classList.contains('open')) {
+      closeSidebar();
+    } else {
+      openSidebar();
+    }
+  }
+  
+  // Add event listener for sidebar toggle button
+  if (sidebarToggle) {
+    sidebarToggle.addEventListener('click', toggleSidebar);
+  }
+  
+  // Close sidebar when clicking overlay
+  if (sidebarOverlay) {
+    sidebarOverlay.addEventListener('click', closeSidebar);
+  }
+  
+  // Close sidebar when pressing Escape key
+  document.addEventListener('keydown', function(e) {
+    if (e.key === 'Escape') {
+      closeSidebar();
+    }
+  });
+
+
+  // ===== ACTIVE LINK HIGHLIGHTING =====
+  function highlightActiveLink() {
+    const currentPath = window.location.pathname;
+    const currentFile = currentPath.split('/').pop() || 'index.html';
+    
+    // Handle navbar active state
+    const navLinks = document.querySelectorAll('.blog-navbar .nav-link');
+    navLinks.forEach(link => {
+      const linkPath = link.getAttribute('href');
+      const linkFile = linkPath.split('/').pop();
+      
+      if (linkFile === currentFile || 
+          (currentFile === '' && linkFile === 'index.html') ||
+          (currentFile === 'blog1.html' && linkPath.includes('blog1')) ||
+          (currentFile === 'blog2.html' && linkPath.includes('blog2'))) {
+        link.classList.add('active');
+      }
+    });
+    
+    // Handle sidebar active state (for blog pages)
+    const sidebarLinks = document.querySelectorAll('.blog-sidebar a');
+    sidebarLinks.forEach(link => {
+      const linkPath = link.getAttribute('href');
+      const linkFile = linkPath.split('/').pop();
+      
+      if (linkFile === currentFile) {
+        link.classList.add('active');
+      }
+    });
+  }
+  
+  // Initialize active link highlighting
+  highlightActiveLink();
+
+
+  // ===== SIDEBAR POST LIST =====
+  // Post pages only ship the most recent posts in their sidebar; the full
+  // list is one shared manifest (written by scripts/convert_writeups.py)
+  // that the browser caches across pages. The last copy is kept in
+  // localStorage so the list is complete right away on later pages.
+  const sidebarPosts = document.getElementById('sidebar-posts');
+
+  function renderSidebarPosts(manifest) {
+    sidebarPosts.innerHTML = '';
+    manifest.posts.forEach(([title, file]) => {
+      const item = document.createElement('li');
+      const link = document.createElement('a');
+      link.href = file;
+      link.innerHTML = iconHTML('file-alt');
+      link.appendChild(document.createTextNode(' ' + title));
+      item.appendChild(link);
+      sidebarPosts.appendChild(item);
+    });
+    highlightActiveLink();
+  }
+
+  if (sidebarPosts && sidebarPosts.dataset.manifest) {
+    let cached = null;
+    try {
+      cached = JSON.parse(localStorage.getItem('blog-posts'));
+    } catch (e) {
+      cached = null;
+    }
+    if (cached && cached.posts) {
+      renderSidebarPosts(cached);
+    }
+
+    // Revalidate with the server; only re-render when the list changed
+    fetch(sidebarPosts.dataset.manifest, { cache: 'no-cache' })
+      .then(response => response.ok ? response.json() : null)
+      .then(manifest => {
+        if (manifest && (!cached || cached.version !== manifest.version)) {
+          localStorage.setItem('blog-posts', JSON.stringify(manifest));
+          renderSidebarPosts(manifest);
+        }
+      })
+      .catch(err => {
+        console.error('Failed to load the post list:', err);
+      });
+  }
+
+
+  // ===== MOBILE NAVBAR TOGGLE =====
+  const mobileMenuBtn = document.getElementById('mobile-menu-btn');
+  const navLinks = document.querySelector('.blog-navbar .nav-links');
+  
+  function toggleMobileNav() {
+    if (navLinks) {
+      navLinks.classList.toggle('mobile-open');
+    }
+    if (mobileMenuBtn) {
+      mobileMenuBtn.classList.toggle('active');
+    }
+  }
+  
+  function closeMobileNav() {
+    if (navLinks) {
+      navLinks.classList.remove('mobile-open');
+    }
+    if (mobileMenuBtn) {
+      mobileMenuBtn.classList.remove('active');
+    }
+  }
+  
+  if (mobileMenuBtn) {
+    mobileMenuBtn.addEventListener('click', toggleMobileNav);
+  }
+  
+  // Close mobile menu when clicking outside
+  document.addEventListener('click', function(e) {
+    if (navLinks && navLinks.classList.contains('mobile-open')) {
+      if (!navLinks.contains(e.target) && !mobileMenuBtn.contains(e.target)) {
+        closeMobileNav();
+      }
+    }
+  });
+  
+  // Close mobile menu when pressing Escape key
+  document.addEventListener('keydown', function(e) {
+    if (e.key === 'Escape') {
+      closeMobileNav();
+    }
+  });
+  
+
+  // ===== SMOOTH SCROLL FOR ANCHOR LINKS =====
+  document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+    anchor.addEventListener('click', function(e) {
+      const href = this.getAttribute('href');
+      if (href !== '#') {
+        e.preventDefault();
+        const target = document.querySelector(href);
+        if (target) {
+          target.scrollIntoView({
+            behavior: 'smooth',
+            block: 'start'
+          });
+        }
+      }
+    });
+  });
+
+
+  // ===== FADE-IN ANIMATION ON SCROLL =====
+  const observerOptions = {
+    root: null,
+    rootMargin: '0px',
+    threshold: 0.1
+  };
+  
+  const observer = new IntersectionObserver((entries) => {
+    entries.forEach(entry => {
+      if (entry.isIntersecting) {
+        entry.target.classList.add('visible');
+      }
+    });
+  }, observerOptions);
+  
+  // Observe elements with fade-in class
+  document.querySelectorAll('.fade-in').forEach(el => {
+    observer.observe(el);
+  });
+
+  // ===== SEARCH =====
+  // The index is built by scripts/search_index.py: _index.json lists the
+  // posts and the term shards, and each shard maps the terms sharing a
+  // prefix to their postings. Only the shards a query needs are fetched.
+  const searchInput = document.getElementById('blog-search');
+  const searchResults = document.getElementById('search-results');
+  const scriptSrc = document.currentScript && document.currentScript.src;
+
+  if (searchInput && searchResults && scriptSrc) {
+    const searchBase = new URL('../search/', scriptSrc);
+    const blogRoot = new URL('../', scriptSrc);
+    const shardCache = {};
+    let metaPromise = null;
+    let searchTimer = null;
+    let searchSeq = 0;
+
+    function fetchJSON(url, options) {
+      return fetch(url, options).then(response => {
+        if (!response.ok) {
+          throw new Error('HTTP ' + response.status + ' for ' + url);
+        }
+        return response.json();
+      });
+    }
+
+    function loadMeta() {
+      if (!metaPromise) {
+        // Unversioned, so revalidated: a stale copy would name doc ids and
+        // shard versions that no longer exist
+        metaPromise = fetchJSON(new URL('_index.json', searchBase), { cache: 'no-cache' });
+      }
+      return metaPromise;
+    }
+
+    function loadShard(meta, prefix) {
+      if (!shardCache[prefix]) {
+        shardCache[prefix] = fetchJSON(new URL(prefix + '.json?v=' + meta.shards[prefix], searchBase));
+      }
+      return shardCache[prefix];
+    }
+
+    // Postings are base-36 numbers: doc-id gaps alternating with scores
+    function addPostings(scores, encoded) {
+      const nums = encoded.split(',');
+      let doc = 0;
+      for (let i = 0; i < nums.length; i += 2) {
+        doc += parseInt(nums[i], 36);
+        scores.set(doc, (scores.get(doc) || 0) + parseInt(nums[i + 1], 36));
+      }
+    }
+
+    // Scores every post containing a word that starts with `term`
+    function scoreTerm(meta, term) {
+      const prefixes = Object.keys(meta.shards).filter(p => term.startsWith(p) || p.startsWith(term));
+      return Promise.all(prefixes.map(p => loadShard(meta, p))).then(shards => {
+        const scores = new Map();
+        shards.forEach(shard => {
+          Object.keys(shard).forEach(word => {
+            if (word.startsWith(term)) {
+              addPostings(scores, shard[word]);
+            }
+          });
+        });
+        return scores;
+      });
+    }
+
+    function search(query) {
+      return loadMeta().then(meta => {
+        const stopWords = new Set(meta.stop_words);
+        const terms = (query.toLowerCase().match(/[a-z0-9]{2,24}/g) || []).filter(t => !stopWords.has(t));
+        if (!terms.length) {
+          return null;
+        }
+        return Promise.all(terms.map(term => scoreTerm(meta, term))).then(perTerm => {
+          // Posts must match every query word
+          const results = [];
+          perTerm[0].forEach((score, doc) => {
+            let total = score;
+            for (let i = 1; i < perTerm.length; i++) {
+              if (!perTerm[i].has(doc)) {
+                return;
+              }
+              total += perTerm[i].get(doc);
+            }
+            results.push([doc, total]);
+          });
+          // Doc ids count up as posts are added, so ties go to newer posts
+          results.sort((a, b) => b[1] - a[1] || b[0] - a[0]);
+          return results.map(([doc]) => meta.docs[doc]);
+        });
+      });
+    }
+
+    function renderResults(results) {
+      searchResults.innerHTML = '';
+      if (results === null) {
+        searchResults.hidden = true;
+        return;
+      }
+      if (!results.length) {
+        const empty = document.createElement('li');
+        empty.className = 'search-empty';
+        empty.textContent = 'No matching posts';
+        searchResults.appendChild(empty);
+      }
+      results.forEach(([title, url, date]) => {
+        const item = document.createElement('li');
+        const link = document.createElement('a');
+        link.href = new URL(url, blogRoot).href;
+        link.textContent = title;
+        const dateSpan = document.createElement('span');
+        dateSpan.className = 'search-date';
+        dateSpan.textContent = date;
+        item.appendChild(link);
+        item.appendChild(dateSpan);
+        searchResults.appendChild(item);
+      });
+      searchResults.hidden = false;
+    }
+
+    searchInput.addEventListener('input', () => {
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(() => {
+        // Ignore answers to queries that were typed over in the meantime
+        const seq = ++searchSeq;
+        search(searchInput.value).then(results => {
+          if (seq === searchSeq) {
+            renderResults(results);
+          }
+        }).catch(err => {
+          console.error('Search failed:', err);
+        });
+      }, 150);
+    });
+  }
+
+  // ===== CODE BLOCK COPY FUNCTIONALITY =====
+  document.querySelectorAll('pre').forEach(preBlock => {
+    // Wrap pre in a non-scrolling wrapper so the copy button doesn't scroll horizontally
+    const wrapper = document.createElement('div');
+    wrapper.className = 'code-wrapper';
+    preBlock.parentNode.insertBefore(wrapper, preBlock);
+    wrapper.appendChild(preBlock);
+
+    // Create copy button and place it in wrapper (outside the scrolling <pre>)
+    const copyBtn = document.createElement('button');
+    copyBtn.className = 'copy-btn';
+    copyBtn.innerHTML = iconHTML('copy');
+    copyBtn.title = 'Copy code to clipboard';
+    wrapper.appendChild(copyBtn);
+
+    // Add click handler
+    copyBtn.addEventListener('click', () => {
+      // Prefer the inner <code> text when present to avoid copying button text
+      const codeElem = preBlock.querySelector('code');
+      const code = codeElem ? codeElem.textContent.trim() : preBlock.textContent.trim();
+
+      navigator.clipboard.writeText(code).then(() => {
+        // Show success feedback (small icon change)
+        const originalHTML = copyBtn.innerHTML;
+        copyBtn.innerHTML = iconHTML('check');
+        copyBtn.classList.add('copied');
+
+        // Reset after 2 seconds
+        setTimeout(() => {
+          copyBtn.innerHTML = originalHTML;
+          copyBtn.classList.remove('copied');
+        }, 2000);
+      }).catch(err => {
+        console.error('Failed to copy code:', err);
+        const originalHTML = copyBtn.innerHTML;
+        copyBtn.innerHTML = iconHTML('exclamation-circle');
+        setTimeout(() => {
+          copyBtn.innerHTML = originalHTML;
+        }, 2000);
+      });
+    });
+  });
+
+})();
+
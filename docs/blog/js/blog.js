@@ -6,6 +6,12 @@
 (function() {
   'use strict';
 
+  // Icons are symbols in the inline sprite each page carries (written by
+  // scripts/icons.py, which also lists the ones used here)
+  function iconHTML(name) {
+    return '<i class="fas fa-' + name + '"><svg aria-hidden="true"><use href="#fa-' + name + '"></use></svg></i>';
+  }
+
   // ===== THEME TOGGLE =====
   const themeToggle = document.getElementById('theme-toggle');
   
@@ -128,6 +134,53 @@
   highlightActiveLink();
 
 
+  // ===== SIDEBAR POST LIST =====
+  // Post pages only ship the most recent posts in their sidebar; the full
+  // list is one shared manifest (written by scripts/convert_writeups.py)
+  // that the browser caches across pages. The last copy is kept in
+  // localStorage so the list is complete right away on later pages.
+  const sidebarPosts = document.getElementById('sidebar-posts');
+
+  function renderSidebarPosts(manifest) {
+    sidebarPosts.innerHTML = '';
+    manifest.posts.forEach(([title, file]) => {
+      const item = document.createElement('li');
+      const link = document.createElement('a');
+      link.href = file;
+      link.innerHTML = iconHTML('file-alt');
+      link.appendChild(document.createTextNode(' ' + title));
+      item.appendChild(link);
+      sidebarPosts.appendChild(item);
+    });
+    highlightActiveLink();
+  }
+
+  if (sidebarPosts && sidebarPosts.dataset.manifest) {
+    let cached = null;
+    try {
+      cached = JSON.parse(localStorage.getItem('blog-posts'));
+    } catch (e) {
+      cached = null;
+    }
+    if (cached && cached.posts) {
+      renderSidebarPosts(cached);
+    }
+
+    // Revalidate with the server; only re-render when the list changed
+    fetch(sidebarPosts.dataset.manifest, { cache: 'no-cache' })
+      .then(response => response.ok ? response.json() : null)
+      .then(manifest => {
+        if (manifest && (!cached || cached.version !== manifest.version)) {
+          localStorage.setItem('blog-posts', JSON.stringify(manifest));
+          renderSidebarPosts(manifest);
+        }
+      })
+      .catch(err => {
+        console.error('Failed to load the post list:', err);
+      });
+  }
+
+
   // ===== MOBILE NAVBAR TOGGLE =====
   const mobileMenuBtn = document.getElementById('mobile-menu-btn');
   const navLinks = document.querySelector('.blog-navbar .nav-links');
@@ -209,6 +262,143 @@
     observer.observe(el);
   });
 
+  // ===== SEARCH =====
+  // The index is built by scripts/search_index.py: _index.json lists the
+  // posts and the term shards, and each shard maps the terms sharing a
+  // prefix to their postings. Only the shards a query needs are fetched.
+  const searchInput = document.getElementById('blog-search');
+  const searchResults = document.getElementById('search-results');
+  const scriptSrc = document.currentScript && document.currentScript.src;
+
+  if (searchInput && searchResults && scriptSrc) {
+    const searchBase = new URL('../search/', scriptSrc);
+    const blogRoot = new URL('../', scriptSrc);
+    const shardCache = {};
+    let metaPromise = null;
+    let searchTimer = null;
+    let searchSeq = 0;
+
+    function fetchJSON(url, options) {
+      return fetch(url, options).then(response => {
+        if (!response.ok) {
+          throw new Error('HTTP ' + response.status + ' for ' + url);
+        }
+        return response.json();
+      });
+    }
+
+    function loadMeta() {
+      if (!metaPromise) {
+        // Unversioned, so revalidated: a stale copy would name doc ids and
+        // shard versions that no longer exist
+        metaPromise = fetchJSON(new URL('_index.json', searchBase), { cache: 'no-cache' });
+      }
+      return metaPromise;
+    }
+
+    function loadShard(meta, prefix) {
+      if (!shardCache[prefix]) {
+        shardCache[prefix] = fetchJSON(new URL(prefix + '.json?v=' + meta.shards[prefix], searchBase));
+      }
+      return shardCache[prefix];
+    }
+
+    // Postings are base-36 numbers: doc-id gaps alternating with scores
+    function addPostings(scores, encoded) {
+      const nums = encoded.split(',');
+      let doc = 0;
+      for (let i = 0; i < nums.length; i += 2) {
+        doc += parseInt(nums[i], 36);
+        scores.set(doc, (scores.get(doc) || 0) + parseInt(nums[i + 1], 36));
+      }
+    }
+
+    // Scores every post containing a word that starts with `term`
+    function scoreTerm(meta, term) {
+      const prefixes = Object.keys(meta.shards).filter(p => term.startsWith(p) || p.startsWith(term));
+      return Promise.all(prefixes.map(p => loadShard(meta, p))).then(shards => {
+        const scores = new Map();
+        shards.forEach(shard => {
+          Object.keys(shard).forEach(word => {
+            if (word.startsWith(term)) {
+              addPostings(scores, shard[word]);
+            }
+          });
+        });
+        return scores;
+      });
+    }
+
+    function search(query) {
+      return loadMeta().then(meta => {
+        const stopWords = new Set(meta.stop_words);
+        const terms = (query.toLowerCase().match(/[a-z0-9]{2,24}/g) || []).filter(t => !stopWords.has(t));
+        if (!terms.length) {
+          return null;
+        }
+        return Promise.all(terms.map(term => scoreTerm(meta, term))).then(perTerm => {
+          // Posts must match every query word
+          const results = [];
+          perTerm[0].forEach((score, doc) => {
+            let total = score;
+            for (let i = 1; i < perTerm.length; i++) {
+              if (!perTerm[i].has(doc)) {
+                return;
+              }
+              total += perTerm[i].get(doc);
+            }
+            results.push([doc, total]);
+          });
+          // Doc ids count up as posts are added, so ties go to newer posts
+          results.sort((a, b) => b[1] - a[1] || b[0] - a[0]);
+          return results.map(([doc]) => meta.docs[doc]);
+        });
+      });
+    }
+
+    function renderResults(results) {
+      searchResults.innerHTML = '';
+      if (results === null) {
+        searchResults.hidden = true;
+        return;
+      }
+      if (!results.length) {
+        const empty = document.createElement('li');
+        empty.className = 'search-empty';
+        empty.textContent = 'No matching posts';
+        searchResults.appendChild(empty);
+      }
+      results.forEach(([title, url, date]) => {
+        const item = document.createElement('li');
+        const link = document.createElement('a');
+        link.href = new URL(url, blogRoot).href;
+        link.textContent = title;
+        const dateSpan = document.createElement('span');
+        dateSpan.className = 'search-date';
+        dateSpan.textContent = date;
+        item.appendChild(link);
+        item.appendChild(dateSpan);
+        searchResults.appendChild(item);
+      });
+      searchResults.hidden = false;
+    }
+
+    searchInput.addEventListener('input', () => {
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(() => {
+        // Ignore answers to queries that were typed over in the meantime
+        const seq = ++searchSeq;
+        search(searchInput.value).then(results => {
+          if (seq === searchSeq) {
+            renderResults(results);
+          }
+        }).catch(err => {
+          console.error('Search failed:', err);
+        });
+      }, 150);
+    });
+  }
+
   // ===== CODE BLOCK COPY FUNCTIONALITY =====
   document.querySelectorAll('pre').forEach(preBlock => {
     // Wrap pre in a non-scrolling wrapper so the copy button doesn't scroll horizontally
@@ -220,7 +410,7 @@
     // Create copy button and place it in wrapper (outside the scrolling <pre>)
     const copyBtn = document.createElement('button');
     copyBtn.className = 'copy-btn';
-    copyBtn.innerHTML = '<i class="fas fa-copy"></i>';
+    copyBtn.innerHTML = iconHTML('copy');
     copyBtn.title = 'Copy code to clipboard';
     wrapper.appendChild(copyBtn);
 
@@ -233,7 +423,7 @@
       navigator.clipboard.writeText(code).then(() => {
         // Show success feedback (small icon change)
         const originalHTML = copyBtn.innerHTML;
-        copyBtn.innerHTML = '<i class="fas fa-check"></i>';
+        copyBtn.innerHTML = iconHTML('check');
         copyBtn.classList.add('copied');
 
         // Reset after 2 seconds
@@ -244,7 +434,7 @@
       }).catch(err => {
         console.error('Failed to copy code:', err);
         const originalHTML = copyBtn.innerHTML;
-        copyBtn.innerHTML = '<i class="fas fa-exclamation-circle"></i>';
+        copyBtn.innerHTML = iconHTML('exclamation-circle');
         setTimeout(() => {
           copyBtn.innerHTML = originalHTML;
         }, 2000);
@@ -0,0 +1,388 @@
+import contextlib
+import io
+import os
+import re
+import shutil
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import build_cache
+import telemetry
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; figures then use the original image only
+    Image = None
+
+# --- CONFIGURATION ---
+ASSETS_DIR = "docs/assets/images/writeups"
+VARIANTS_DIR = os.path.join(ASSETS_DIR, "variants")
+
+# Widths generated for srcset; the full-size WebP is always added as well
+VARIANT_WIDTHS = (480, 960, 1440)
+# GIFs are left alone so animations survive
+VARIANT_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+WEBP_QUALITY = 80
+
+# Below this many copies a thread pool costs more than it saves
+PARALLEL_COPY_THRESHOLD = 8
+
+# Videos are published under the same relative path they have in the
+# source directory, and only while a post embeds them
+VIDEOS_SRC_DIR = "blog-src/assets/videos"
+VIDEOS_DIR = "docs/assets/videos"
+
+# Hand-written blog assets, relative to STATIC_DIR. Pages link to a copy
+# named after the content's digest, so browsers can cache it for good.
+STATIC_DIR = "docs/blog"
+STATIC_FILES = ("css/blog.css", "js/blog.js")
+# Hex digits of the content digest kept in fingerprinted filenames
+FINGERPRINT_LENGTH = 8
+
+
+def assign_names(src_paths, file_cache):
+    """Maps every referenced source image to its stored filename.
+
+    Images are stored by content: byte-identical sources share a single
+    stored file, named after the first of their paths in sorted order plus
+    a short digest suffix, so a changed image gets a new URL. Should two
+    different images still claim the same filename, the later one gets the
+    full digest. Names are recomputed from scratch on every build, so the
+    result depends only on the set of referenced images.
+
+    Returns {src_path: (stored_name, digest)}.
+    """
+    digests = {src_path: build_cache.file_digest(src_path, file_cache) for src_path in set(src_paths)}
+
+    by_digest = {}
+    for src_path in sorted(digests):
+        by_digest.setdefault(digests[src_path], src_path)
+
+    owners = {}
+    names = {}
+    for digest, src_path in sorted(by_digest.items(), key=lambda item: item[1]):
+        stem, ext = os.path.splitext(os.path.basename(src_path))
+        name = f"{stem}-{digest[:FINGERPRINT_LENGTH]}{ext}"
+        if owners.setdefault(name, digest) != digest:
+            name = f"{stem}-{digest}{ext}"
+            owners[name] = digest
+        names[digest] = name
+
+    return {src_path: (names[digest], digest) for src_path, digest in digests.items()}
+
+
+def _copy(src_path, dest_path):
+    # Copied next to the destination first, so a copy cut short never
+    # takes its place
+    tmp_path = dest_path + ".tmp"
+    shutil.copy(src_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def sync_assets(assignments, file_cache, dest_dir=ASSETS_DIR):
+    """Copies assigned images into `dest_dir`, skipping any whose stored
+    copy already has the right content. Returns the number of files copied.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+
+    copies = {}
+    current = set()
+    for src_path, (name, digest) in assignments.items():
+        dest_path = os.path.join(dest_dir, name)
+        if dest_path in copies or dest_path in current:
+            continue
+        if os.path.exists(dest_path) and build_cache.file_digest(dest_path, file_cache) == digest:
+            current.add(dest_path)
+            continue
+        copies[dest_path] = (src_path, digest)
+
+    if len(copies) >= PARALLEL_COPY_THRESHOLD:
+        with ThreadPoolExecutor(max_workers=min(32, len(copies))) as pool:
+            list(pool.map(_copy, [src for src, _ in copies.values()], copies))
+    else:
+        for dest_path, (src_path, _) in copies.items():
+            _copy(src_path, dest_path)
+
+    # Record the fresh copies so the next build doesn't rehash them
+    for dest_path, (_, digest) in copies.items():
+        st = os.stat(dest_path)
+        telemetry.add("bytes_written", st.st_size)
+        file_cache[dest_path] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+
+    # Counted here rather than by the copies, which may run on threads
+    build_cache.add_output_counts({"updated": len(copies), "unchanged": len(current)})
+    return len(copies)
+
+
+def _link_or_copy(src_path, dest_path):
+    """Publishes `src_path` at `dest_path` as a hard link, or as a copy
+    (keeping its mtime) when the two are on different filesystems.
+    Returns True when the file was linked.
+    """
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = dest_path + ".tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(src_path, tmp_path)
+        linked = True
+    except OSError:
+        shutil.copy2(src_path, tmp_path)
+        linked = False
+    os.replace(tmp_path, dest_path)
+    return linked
+
+
+def is_published(src_path, dest_path, file_cache):
+    """True when `dest_path` already holds the content of `src_path`: the
+    same file, a copy with the same size and mtime, or failing those a
+    copy with the same digest.
+    """
+    try:
+        dest = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    src = os.stat(src_path)
+    if os.path.samestat(src, dest):
+        return True
+    if src.st_size != dest.st_size:
+        return False
+    if src.st_mtime_ns == dest.st_mtime_ns:
+        return True
+    return build_cache.file_digest(src_path, file_cache) == build_cache.file_digest(dest_path, file_cache)
+
+
+def sync_media(refs, file_cache, src_dir=VIDEOS_SRC_DIR, dest_dir=VIDEOS_DIR):
+    """Publishes the media files posts embed, given as paths relative to
+    `src_dir`, into `dest_dir`. Files already published are left alone,
+    and files no post embeds any more are removed; referenced files that
+    don't exist are reported. Returns the number of files published.
+    """
+    published = set()
+    written = 0
+    for ref in sorted(set(refs)):
+        src_path = os.path.join(src_dir, ref)
+        dest_path = os.path.join(dest_dir, ref)
+        if not os.path.isfile(src_path):
+            print(f"Warning: media file not found: {src_path}")
+            continue
+        published.add(dest_path)
+        if is_published(src_path, dest_path, file_cache):
+            build_cache.add_output_counts({"unchanged": 1})
+            continue
+        _link_or_copy(src_path, dest_path)
+        telemetry.add("bytes_written", os.path.getsize(dest_path))
+        build_cache.add_output_counts({"updated": 1})
+        written += 1
+
+    for root, _, files in os.walk(dest_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if path not in published:
+                build_cache.remove_output(path)
+                print(f"Removed {path} (no post embeds it)")
+    return written
+
+
+def fingerprint_static(file_cache, static_dir=STATIC_DIR, files=STATIC_FILES):
+    """Copies each static (text) file to a name carrying its content
+    digest, next to the original (css/blog.css -> css/blog.1a2b3c4d.css),
+    and removes copies of older versions. Returns {path: fingerprinted
+    path}, both relative to `static_dir`.
+    """
+    urls = {}
+    for path in files:
+        src_path = os.path.join(static_dir, path)
+        digest = build_cache.file_digest(src_path, file_cache)
+        stem, ext = os.path.splitext(path)
+        urls[path] = f"{stem}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+        dest_path = os.path.join(static_dir, urls[path])
+        with open(src_path, "r", encoding="utf-8") as f:
+            if build_cache.write_if_changed(dest_path, f.read()):
+                print(f"Fingerprinted {src_path} -> {dest_path}")
+
+        directory, filename = os.path.split(src_path)
+        old_copy = re.compile(re.escape(os.path.splitext(filename)[0]) + r"\.[0-9a-f]{%d}" % FINGERPRINT_LENGTH + re.escape(ext))
+        for other in os.listdir(directory):
+            if old_copy.fullmatch(other) and other != os.path.basename(dest_path):
+                build_cache.remove_output(os.path.join(directory, other))
+    return urls
+
+
+# JPEG start-of-frame markers carry the image size (C4, C8 and CC are not frames)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # standalone markers have no length
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">xHH", data)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(path):
+    """Returns (width, height) of a PNG, JPEG, GIF, WebP or BMP image by
+    reading only its header, or None for unknown or truncated files.
+    """
+    with open(path, "rb") as f:
+        head = f.read(32)
+
+        if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        if head[:2] == b"BM" and len(head) >= 26:
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height)
+        if head[:2] == b"\xff\xd8":
+            return _jpeg_size(f)
+    return None
+
+
+def image_dimensions(assignments, cache):
+    """Returns {stored_name: (width, height)} for the assigned images whose
+    size can be read. Sizes are cached in `cache` (the manifest's
+    "dimensions" section) by content digest.
+    """
+    dimensions = {}
+    live = set()
+    for src_path, (name, digest) in assignments.items():
+        live.add(digest)
+        if digest not in cache:
+            try:
+                size = read_image_size(src_path)
+            except (OSError, struct.error):
+                size = None
+            cache[digest] = list(size) if size else None
+        if cache[digest]:
+            dimensions[name] = tuple(cache[digest])
+
+    for digest in list(cache):
+        if digest not in live:
+            del cache[digest]
+
+    return dimensions
+
+
+def _encode_variants(src_path, stem):
+    """Encodes the downscaled WebP variants of one image and returns
+    (width, height, [[variant_width, filename], ...], [data, ...]).
+    """
+    with Image.open(src_path) as im:
+        width, height = im.size
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if im.mode in ("LA", "P", "PA") or "transparency" in im.info else "RGB")
+
+        files = []
+        encoded = []
+        for variant_width in [w for w in VARIANT_WIDTHS if w < width] + [width]:
+            filename = f"{stem}-{variant_width}w.webp"
+            if variant_width == width:
+                resized = im
+            else:
+                resized = im.resize((variant_width, round(height * variant_width / width)), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+            files.append([variant_width, filename])
+            encoded.append(buffer.getvalue())
+
+    return width, height, files, encoded
+
+
+def build_variants(assignments, cache, dest_dir=VARIANTS_DIR, jobs=1):
+    """Generates responsive WebP variants for every assigned raster image.
+
+    Results are cached in `cache` (the manifest's "variants" section) by
+    source digest, so an image is only re-encoded when its content or
+    stored name changes. Images Pillow can't read are reported and get no
+    variants, so their figures show the original file. Returns
+    {stored_name: variant entry}, or an empty dict when Pillow is not
+    installed.
+    """
+    if Image is None:
+        print("Warning: Pillow is not installed; skipping responsive image variants")
+        return {}
+
+    os.makedirs(dest_dir, exist_ok=True)
+
+    stored = {}
+    for src_path, (name, digest) in assignments.items():
+        if os.path.splitext(name)[1].lower() in VARIANT_EXTENSIONS:
+            stored.setdefault(digest, (name, src_path))
+
+    todo = []
+    for digest, (name, src_path) in sorted(stored.items()):
+        entry = cache.get(digest)
+        if (entry and entry["name"] == name
+                and all(os.path.exists(os.path.join(dest_dir, f)) for _, f in entry["files"])):
+            build_cache.add_output_counts({"unchanged": len(entry["files"])})
+            continue
+        todo.append((digest, name, src_path))
+
+    def encode(item):
+        digest, name, src_path = item
+        try:
+            return _encode_variants(src_path, os.path.splitext(name)[0])
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            print(f"Warning: could not generate variants for {src_path}: {e}")
+            return None
+
+    # Pillow releases the GIL while resizing and encoding, so threads
+    # scale. Variants are encoded in memory and written here, one image at
+    # a time, like every other output: an interrupted build never leaves a
+    # truncated variant that the cache takes as current.
+    with contextlib.ExitStack() as stack:
+        if jobs > 1 and len(todo) > 1:
+            pool = stack.enter_context(ThreadPoolExecutor(max_workers=min(jobs, len(todo))))
+            results = pool.map(encode, todo)
+        else:
+            results = map(encode, todo)
+
+        generated = 0
+        for (digest, name, _), result in zip(todo, results):
+            # An entry left from an older stored name is stale either way
+            cache.pop(digest, None)
+            if result is None:
+                continue
+            width, height, files, encoded = result
+            for (_, filename), data in zip(files, encoded):
+                build_cache.write_if_changed(os.path.join(dest_dir, filename), data)
+            cache[digest] = {"name": name, "width": width, "height": height, "files": files}
+            generated += 1
+    if generated:
+        print(f"Generated responsive variants for {generated} image(s)")
+
+    for digest in list(cache):
+        if digest not in stored:
+            del cache[digest]
+
+    return {cache[digest]["name"]: cache[digest] for digest in stored if digest in cache}
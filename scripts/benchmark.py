@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Measures how the writeup converter scales with the size of the blog.
+
+    python scripts/benchmark.py [--sizes 10,1000,10000] [--output benchmark.json]
+
+For each size a synthetic blog-src corpus shaped like the real writeups is
+generated in a scratch directory and built three times: cold (no cache or
+output), warm (nothing changed) and after editing a single post. Time
+spent in each converter stage is recorded, and all results are written as
+JSON so runs from different commits can be compared.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import date, timedelta
+
+import assets
+import build_cache
+import convert_writeups
+import critical_css
+import icons
+import search_index
+import update_blog_index
+
+# --- CONFIGURATION ---
+DEFAULT_SIZES = (10, 1000, 10000)
+SEED = 1337
+
+# Posts draw their figures from a shared pool, as real writeups reuse
+# screenshots of the same tools
+IMAGE_POOL = 40
+IMAGE_SIZE = (320, 200)
+
+SECTIONS_PER_POST = 6
+WORDS = """
+    target scan port service exploit payload request response header cookie
+    token session admin user password hash flag shell reverse listener
+    upload file path traversal injection query parameter filter bypass
+    endpoint server client browser proxy burp nmap ffuf gobuster directory
+    enumeration privilege escalation kernel binary buffer overflow stack
+    web crypto forensics network packet capture decode encode base64 jwt
+""".split()
+TAGS = ["web", "tryhackme", "hackthebox", "ctf", "crypto", "forensics", "pwn", "osint", "jwt", "privacy"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+PLATFORMS = ["TryHackMe", "HackTheBox", "PicoCTF", "IITB Trust Lab"]
+
+# The converter functions timed, as (module, attribute, stage name)
+STAGES = [
+    (convert_writeups, "get_all_posts", "get_all_posts"),
+    (assets, "assign_names", "assign_names"),
+    (assets, "sync_assets", "sync_assets"),
+    (assets, "sync_media", "sync_media"),
+    (assets, "build_variants", "build_variants"),
+    (assets, "image_dimensions", "image_dimensions"),
+    (convert_writeups, "convert_obsidian_images", "convert_obsidian_images"),
+    (convert_writeups, "process_figures", "process_figures"),
+    (convert_writeups, "markdown_to_html", "markdown"),
+    (convert_writeups, "render_page", "template_render"),
+    (critical_css, "extract", "critical_css"),
+    (build_cache, "write_stream", "write_page"),
+    (convert_writeups, "update_blog_index", "update_blog_index"),
+    (search_index, "build_search_index", "build_search_index"),
+]
+
+
+def png_bytes(width, height, shade):
+    """Returns a small valid grayscale PNG."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\x00" + bytes((shade + x) % 256 for x in range(width)) for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows))
+            + chunk(b"IEND", b""))
+
+
+def sentence(rng, words=12):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def make_post(rng, number, images):
+    """Returns the markdown of one synthetic writeup."""
+    name = f"Synthetic Room {number}"
+    published = date(2026, 1, 1) - timedelta(days=number)
+    tags = rng.sample(TAGS, 3)
+    lines = [
+        f"# {name} Write-up",
+        "",
+        f"> {sentence(rng, 20)}",
+        "",
+        f"Title: {name} Write-up  ",
+        f"Date: {published.isoformat()}  ",
+        "Author: Benchmark  ",
+        f"Tags: [{', '.join(tags)}]  ",
+        "",
+        "## Challenge Metadata",
+        "",
+        f"- **Room Name:** {name}  ",
+        f"- **Platform:** {rng.choice(PLATFORMS)}  ",
+        f"- **Difficulty:** {rng.choice(DIFFICULTIES)}  ",
+        f"- **Category:** {tags[0].title()}  ",
+        f"- **Points:** {rng.randrange(50, 500, 50)}  ",
+        "",
+        "---",
+    ]
+    for section in range(SECTIONS_PER_POST):
+        image = rng.choice(images)
+        lines += [
+            "",
+            f"### {sentence(rng, 3)[:-1]}",
+            " ".join(sentence(rng) for _ in range(4)),
+            "",
+            "```bash",
+            *(f"$ {rng.choice(WORDS)} -{rng.choice('abcdefghijklmnop')} {rng.choice(WORDS)}" for _ in range(6)),
+            "```",
+            "",
+            f"![[{image}]]",
+            f"As shown in {image}, {sentence(rng).lower()}",
+        ]
+        if section % 2:
+            lines += [
+                "",
+                f'<img width="{IMAGE_SIZE[0]}" height="{IMAGE_SIZE[1]}" alt="step {section}" '
+                f'src="https://example.com/assets/{number}-{section}.png" />',
+            ]
+    lines += ["", "## Flag", "", f"`flag{{{rng.getrandbits(64):016x}}}`", ""]
+    return "\n".join(lines)
+
+
+def generate_corpus(root, count, seed=SEED):
+    """Writes a synthetic blog-src with `count` posts, plus the templates,
+    static files and icons the converter needs, under `root`.
+    """
+    rng = random.Random(seed)
+    images_dir = os.path.join(root, convert_writeups.BLOG_ASSETS_DIR)
+    os.makedirs(images_dir)
+    images = [f"Pasted image {n:04d}.png" for n in range(IMAGE_POOL)]
+    for n, image in enumerate(images):
+        with open(os.path.join(images_dir, image), "wb") as f:
+            f.write(png_bytes(*IMAGE_SIZE, shade=n * 6))
+
+    for number in range(count):
+        path = os.path.join(root, convert_writeups.SRC_DIR, f"SYN-{number:05d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_post(rng, number, images))
+
+    for template_dir, template_name in (
+            (convert_writeups.TEMPLATE_DIR, convert_writeups.TEMPLATE_NAME),
+            (update_blog_index.TEMPLATE_DIR, update_blog_index.TEMPLATE_NAME)):
+        os.makedirs(os.path.join(root, template_dir), exist_ok=True)
+        shutil.copy(os.path.join(template_dir, template_name), os.path.join(root, template_dir, template_name))
+
+    for path in assets.STATIC_FILES:
+        dest_path = os.path.join(root, assets.STATIC_DIR, path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        shutil.copy(os.path.join(assets.STATIC_DIR, path), dest_path)
+
+    shutil.copytree(icons.ICON_DIR, os.path.join(root, icons.ICON_DIR))
+
+
+class StageTimer:
+    """Accumulates call counts and wall time per converter stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def wrap(self, name, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+                stage["calls"] += 1
+                stage["seconds"] += time.perf_counter() - start
+        return timed
+
+
+@contextlib.contextmanager
+def timed_stages(timer):
+    """Swaps the converter's stage functions for timed wrappers."""
+    originals = [(module, attr, getattr(module, attr)) for module, attr, _ in STAGES]
+    try:
+        for module, attr, name in STAGES:
+            setattr(module, attr, timer.wrap(name, getattr(module, attr)))
+        yield
+    finally:
+        for module, attr, fn in originals:
+            setattr(module, attr, fn)
+
+
+def run_build(root, label):
+    """Runs one serial build in `root` and returns its result record."""
+    timer = StageTimer()
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        with timed_stages(timer), contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            convert_writeups.main(["--jobs", "1"])
+            seconds = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+
+    stages = {name: {"calls": s["calls"], "seconds": round(s["seconds"], 6)} for name, s in sorted(timer.stages.items())}
+    return {"build": label, "seconds": round(seconds, 6), "stages": stages}
+
+
+def edit_one_post(root, count):
+    """Appends a paragraph to the post in the middle of the corpus."""
+    path = os.path.join(root, convert_writeups.SRC_DIR, f"SYN-{count // 2:05d}.md")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\nAn extra paragraph added by the benchmark.\n")
+
+
+def benchmark_size(count, keep=False):
+    root = tempfile.mkdtemp(prefix=f"blog-bench-{count}-")
+    try:
+        start = time.perf_counter()
+        generate_corpus(root, count)
+        print(f"{count} posts: generated corpus in {time.perf_counter() - start:.1f}s")
+
+        results = []
+        for label in ("cold", "warm", "one_changed"):
+            if label == "one_changed":
+                edit_one_post(root, count)
+            result = run_build(root, label)
+            result["posts"] = count
+            results.append(result)
+            print(f"{count} posts: {label} build {result['seconds']:.3f}s")
+        return results
+    finally:
+        if keep:
+            print(f"Kept corpus in {root}")
+        else:
+            shutil.rmtree(root)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the writeup converter on synthetic corpora.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated corpus sizes (number of posts)")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the JSON results")
+    parser.add_argument("--keep", action="store_true", help="keep the generated corpora for inspection")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    results = []
+    for count in sizes:
+        results += benchmark_size(count, args.keep)
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "argv": sys.argv[1:],
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
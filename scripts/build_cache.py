@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+import telemetry
+
+# --- CONFIGURATION ---
+CACHE_DIR = ".build-cache"
+MANIFEST_FILE = os.path.join(CACHE_DIR, "manifest.json")
+JINJA_CACHE_DIR = os.path.join(CACHE_DIR, "jinja")
+MANIFEST_VERSION = 7
+
+# Outputs written, left as they were or removed by this process, for the
+# build summary; see take_output_counts()
+_output_counts = {"updated": 0, "unchanged": 0, "deleted": 0}
+
+
+def empty_manifest():
+    """Returns a fresh manifest with no cached files or posts."""
+    return {"version": MANIFEST_VERSION, "files": {}, "listings": {}, "posts": {}, "variants": {}, "dimensions": {}, "search": {}, "optimized": {}}
+
+
+def load_manifest(path=MANIFEST_FILE):
+    """Loads the build manifest, falling back to an empty one if it is
+    missing, unreadable or written by an incompatible version.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty_manifest()
+
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+
+    for section in ("files", "listings", "posts", "variants", "dimensions", "search", "optimized"):
+        manifest.setdefault(section, {})
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    """Writes the manifest atomically so an interrupted build never leaves
+    a truncated file behind.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # Encoded compactly and in one go, which lets json use its C
+        # encoder; the manifest records every output's dependencies
+        f.write(json.dumps(manifest, sort_keys=True, separators=(",", ":")))
+        telemetry.add("bytes_written", f.tell())
+    os.replace(tmp_path, path)
+
+
+def hash_bytes(data):
+    """Returns the hex sha256 digest of a bytes object."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_parts(*parts):
+    """Combines several JSON-serialisable values into a single digest."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hash_bytes(payload.encode("utf-8"))
+
+
+def _same(a, b):
+    # Compared as JSON, so tuples match the lists they are stored as
+    return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+
+def explain_changes(recorded, deps, outputs=()):
+    """Returns why an output has to be rebuilt, as a list of reasons, or
+    an empty list when it is up to date.
+
+    `deps` names everything the output depends on: each entry is either a
+    value ("template") or a dict of named values ("image"), compared
+    against the `recorded` dependencies of the last build item by item.
+    `outputs` are the files that must still exist.
+    """
+    if recorded is None:
+        return ["not built before"]
+    reasons = []
+    for name in sorted(recorded.keys() | deps.keys()):
+        before, after = recorded.get(name), deps.get(name)
+        if _same(before, after):
+            continue
+        if isinstance(before, dict) and isinstance(after, dict):
+            for item in sorted(before.keys() | after.keys()):
+                if item not in before:
+                    reasons.append(f"{name} {item} added")
+                elif item not in after:
+                    reasons.append(f"{name} {item} removed")
+                elif not _same(before[item], after[item]):
+                    reasons.append(f"{name} {item} changed")
+        else:
+            reasons.append(f"{name} changed")
+    reasons += [f"output {path} is missing" for path in outputs if not os.path.exists(path)]
+    return reasons
+
+
+def file_digest(path, file_cache):
+    """Returns the sha256 digest of a file.
+
+    `file_cache` maps paths to their last seen (mtime_ns, size, digest).
+    When the file's stat matches the cached entry the stored digest is
+    reused without reading the file; otherwise the file is rehashed and
+    the cache entry refreshed.
+    """
+    st = os.stat(path)
+    cached = file_cache.get(path)
+    if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+        telemetry.add("cache_hit")
+        return cached["sha256"]
+    telemetry.add("cache_miss")
+    telemetry.add("bytes_read", st.st_size)
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    file_cache[path] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+    return digest
+
+
+def take_output_counts():
+    """Returns and resets this process's counts of updated, unchanged and
+    deleted outputs.
+    """
+    counts = dict(_output_counts)
+    for kind in _output_counts:
+        _output_counts[kind] = 0
+    return counts
+
+
+def add_output_counts(counts):
+    """Adds output counts taken in a worker process."""
+    for kind, count in counts.items():
+        _output_counts[kind] += count
+
+
+def same_file_content(path, size, digest):
+    """True when the file at `path` has the given size and sha256 digest."""
+    try:
+        if os.path.getsize(path) != size:
+            return False
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+    except OSError:
+        return False
+    return h.hexdigest() == digest
+
+
+def replace_output(tmp_path, path, size):
+    """Atomically moves a finished temporary file over `path`."""
+    os.replace(tmp_path, path)
+    _output_counts["updated"] += 1
+    telemetry.add("bytes_written", size)
+
+
+def write_if_changed(path, content):
+    """Writes `content` (text, or bytes written as they are) to `path`
+    unless the file already holds it, replacing the file atomically.
+    Returns True when the file was written.
+    """
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    if same_file_content(path, len(data), hash_bytes(data)):
+        _output_counts["unchanged"] += 1
+        return False
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    replace_output(tmp_path, path, len(data))
+    return True
+
+
+def write_stream(path, chunks):
+    """Writes an iterable of text chunks to `path` as they are produced,
+    so the whole text never has to be held in memory.
+
+    The chunks go to a temporary file, hashed on the way, which replaces
+    `path` once complete and only if the bytes differ, so an interrupted
+    build never leaves a truncated page behind and unchanged pages keep
+    their mtime. Returns True when the file was written.
+    """
+    tmp_path = path + ".tmp"
+    h = hashlib.sha256()
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                data = chunk.encode("utf-8")
+                h.update(data)
+                f.write(data)
+            size = f.tell()
+        if same_file_content(path, size, h.hexdigest()):
+            os.remove(tmp_path)
+            _output_counts["unchanged"] += 1
+            return False
+        replace_output(tmp_path, path, size)
+        return True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def remove_output(path):
+    """Deletes an output that is no longer produced, if it exists."""
+    if os.path.exists(path):
+        os.remove(path)
+        _output_counts["deleted"] += 1
+
+
+def template_environment(template_dir, **options):
+    """Returns a Jinja2 environment whose compiled templates are cached on
+    disk under CACHE_DIR, so new processes skip recompiling them. Jinja
+    keys the cache on the template source's checksum, so edits are picked
+    up straight away.
+    """
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    return Environment(loader=FileSystemLoader(template_dir),
+                       bytecode_cache=FileSystemBytecodeCache(JINJA_CACHE_DIR),
+                       **options)
+
+
+def prune(manifest, live_posts):
+    """Drops cached entries for posts that no longer exist in the source
+    directory, and file digests for paths that have disappeared.
+    """
+    for key in list(manifest["posts"]):
+        if key not in live_posts:
+            del manifest["posts"][key]
+
+    for path in list(manifest["files"]):
+        if not os.path.exists(path):
+            del manifest["files"][path]
@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+
+import build_cache
+import telemetry
+from posts import Post, list_post_files, load_listing, slugify, try_parse_date, SRC_DIR
+
+# --- CONFIGURATION ---
+CATALOGUE_FILE = os.path.join(build_cache.CACHE_DIR, "catalogue.sqlite")
+
+# Bump whenever the schema or the way posts are parsed changes; an older
+# catalogue is then rebuilt from scratch
+CATALOGUE_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE posts (
+    source TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    sort_date TEXT NOT NULL,
+    read_time TEXT NOT NULL,
+    record TEXT NOT NULL,
+    -- The post's LISTED_VERSION when the listing pages were last rendered
+    listed TEXT
+);
+CREATE INDEX posts_by_date ON posts (sort_date DESC, source);
+
+-- One row per post in each archive it is listed in ("tags", "difficulty"),
+-- with the post's date copied in so archive pages are read in index order
+CREATE TABLE archive_posts (
+    section TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sort_date TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (section, slug, source)
+);
+CREATE INDEX archive_posts_by_date ON archive_posts (section, slug, sort_date DESC, source);
+CREATE INDEX archive_posts_by_source ON archive_posts (source);
+"""
+
+# Everything about a post its listing entries depend on, in the order
+# posts are listed by; the sort date comes last
+LISTED_VERSION = "digest || ' ' || read_time || ' ' || sort_date"
+
+
+def archive_values(post):
+    """Returns {section: [values]} for the archives a post is listed in."""
+    return {"tags": post.tags, "difficulty": [post.difficulty] if post.difficulty else []}
+
+
+class Catalogue:
+    """The blog's posts as listing records (see posts.load_listing) in a
+    SQLite database, kept up to date incrementally from the source files.
+
+    Listings are read with indexed queries in index order, newest first,
+    so paging through an archive never loads or sorts the whole corpus.
+    """
+
+    def __init__(self, path=CATALOGUE_FILE, reset=False):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if reset or version != CATALOGUE_VERSION:
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS posts")
+                self.conn.execute("DROP TABLE IF EXISTS archive_posts")
+                self.conn.executescript(SCHEMA)
+                self.conn.execute(f"PRAGMA user_version = {CATALOGUE_VERSION}")
+
+    def commit(self):
+        """Commits pending read times and listing marks."""
+        self.conn.commit()
+
+    def close(self):
+        """Commits pending read times and closes the database."""
+        self.commit()
+        self.conn.close()
+
+    def sync(self, file_cache, sources=None):
+        """Brings the catalogue up to date with the source directory.
+
+        Posts whose file is unchanged since the last sync are skipped on
+        its stat alone; the others are hashed (through `file_cache`, see
+        build_cache.file_digest) and re-read only when their content
+        changed. Posts whose file is gone are removed. `sources` limits the
+        sync to those post files, for a caller that knows which ones
+        changed. Returns the number of posts added or updated.
+        """
+        if sources is None:
+            known = {row[0]: row[1:] for row in self.conn.execute("SELECT source, mtime_ns, size, digest FROM posts")}
+            present = list_post_files()
+        else:
+            known = {row[0]: row[1:] for md_file in sources for row in self.conn.execute(
+                "SELECT source, mtime_ns, size, digest FROM posts WHERE source = ?", (md_file,))}
+            present = sorted(md_file for md_file in sources if os.path.isfile(os.path.join(SRC_DIR, md_file)))
+        changed = 0
+        with self.conn:
+            for md_file in present:
+                path = os.path.join(SRC_DIR, md_file)
+                st = os.stat(path)
+                row = known.pop(md_file, None)
+                if row and row[:2] == (st.st_mtime_ns, st.st_size):
+                    telemetry.add("cache_hit")
+                    continue
+                digest = build_cache.file_digest(path, file_cache)
+                if row and row[2] == digest:
+                    self.conn.execute("UPDATE posts SET mtime_ns = ?, size = ? WHERE source = ?",
+                                      (st.st_mtime_ns, st.st_size, md_file))
+                    telemetry.add("cache_hit")
+                    continue
+                telemetry.add("cache_miss")
+                self._store(load_listing(md_file), st, digest)
+                changed += 1
+
+            for md_file in known:
+                self._delete(md_file)
+        return changed
+
+    def _delete(self, md_file):
+        self.conn.execute("DELETE FROM posts WHERE source = ?", (md_file,))
+        self.conn.execute("DELETE FROM archive_posts WHERE source = ?", (md_file,))
+
+    def _store(self, post, st, digest):
+        sort_date = try_parse_date(post.date).isoformat()
+        record = post.to_dict()
+        del record["read_time"]
+        listed = self.conn.execute("SELECT listed FROM posts WHERE source = ?", (post.source,)).fetchone()
+        self._delete(post.source)
+        self.conn.execute("INSERT INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          (post.source, st.st_mtime_ns, st.st_size, digest, sort_date, post.read_time,
+                           json.dumps(record, sort_keys=True), listed and listed[0]))
+        for section, values in archive_values(post).items():
+            # The first spelling of a value wins, as in the listing
+            self.conn.executemany("INSERT OR IGNORE INTO archive_posts VALUES (?, ?, ?, ?, ?)",
+                                  [(section, slugify(value), value, sort_date, post.source) for value in values])
+
+    def set_read_time(self, md_file, read_time):
+        """Records the read time computed from a post's rendered page. It is
+        committed with the next sync or on close().
+        """
+        self.conn.execute("UPDATE posts SET read_time = ? WHERE source = ?", (read_time, md_file))
+
+    @staticmethod
+    def _post(row):
+        record, read_time = row
+        return Post.from_dict(dict(json.loads(record), read_time=read_time))
+
+    def count(self, section=None, slug=None):
+        """Returns the number of posts, or of posts in one archive."""
+        if section is None:
+            return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM archive_posts WHERE section = ? AND slug = ?",
+                                 (section, slug)).fetchone()[0]
+
+    def _select(self, columns, section, slug, offset, limit):
+        if section is None:
+            return self.conn.execute(
+                f"SELECT {columns} FROM posts p ORDER BY p.sort_date DESC, p.source LIMIT ? OFFSET ?",
+                (limit, offset))
+        return self.conn.execute(
+            f"SELECT {columns} FROM archive_posts a JOIN posts p USING (source)"
+            " WHERE a.section = ? AND a.slug = ? ORDER BY a.sort_date DESC, a.source LIMIT ? OFFSET ?",
+            (section, slug, limit, offset))
+
+    def posts(self, section=None, slug=None, offset=0, limit=-1):
+        """Returns posts as Post records (without their body), newest first:
+        all of them, or the ones in one archive, from `offset` on and at
+        most `limit` of them.
+        """
+        return [self._post(row) for row in self._select("p.record, p.read_time", section, slug, offset, limit)]
+
+    def versions(self, section=None, slug=None, offset=0, limit=-1):
+        """Returns [source, digest, read time] for the posts posts() would
+        return, which is everything their records depend on. Cheaper than
+        loading the records, to tell whether a listing changed.
+        """
+        return [list(row) for row in self._select("p.source, p.digest, p.read_time", section, slug, offset, limit)]
+
+    def changed_since_listed(self):
+        """Returns [(source, sort_date, listed sort_date or None)] for the
+        posts whose listing entries changed since mark_listed().
+        """
+        rows = self.conn.execute(
+            f"SELECT source, sort_date, listed FROM posts WHERE listed IS NOT {LISTED_VERSION}").fetchall()
+        return [(source, sort_date, listed and listed.rsplit(" ", 1)[1]) for source, sort_date, listed in rows]
+
+    def mark_listed(self):
+        """Records that the listing pages now show every post as it is.
+        Committed with the next sync or on close(), so a build that fails
+        before saving its manifest leaves the posts marked as changed.
+        """
+        self.conn.execute(f"UPDATE posts SET listed = {LISTED_VERSION} WHERE listed IS NOT {LISTED_VERSION}")
+
+    def rank(self, sort_date, source):
+        """Returns how many posts are listed before a post with this sort
+        date and source in the main index.
+        """
+        return self.conn.execute("SELECT COUNT(*) FROM posts WHERE sort_date > ? OR (sort_date = ? AND source < ?)",
+                                 (sort_date, sort_date, source)).fetchone()[0]
+
+    def archives_of(self, sources):
+        """Returns the set of (section, slug) archives listing any of `sources`."""
+        sources = list(sources)
+        return {row for i in range(0, len(sources), 500) for row in self.conn.execute(
+            "SELECT DISTINCT section, slug FROM archive_posts WHERE source IN (%s)" % ",".join("?" * len(sources[i:i + 500])),
+            sources[i:i + 500])}
+
+    def archives(self, section):
+        """Returns [(slug, name, count)] for an archive section, sorted by
+        slug. Each value is named as spelled by its newest post.
+        """
+        return self.conn.execute(
+            "SELECT slug, name, count FROM ("
+            " SELECT slug, name, COUNT(*) OVER (PARTITION BY slug) AS count,"
+            "  ROW_NUMBER() OVER (PARTITION BY slug ORDER BY sort_date DESC, source) AS n"
+            " FROM archive_posts WHERE section = ?"
+            ") WHERE n = 1 ORDER BY slug", (section,)).fetchall()
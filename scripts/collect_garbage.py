@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Removes build outputs under docs/ that no page links to any more.
+
+Run from the repository root after the converter:
+
+    python scripts/collect_garbage.py [--dry-run]
+
+Every page under docs/ that isn't a collectable post page is a root, hand
+written or not (the listing pages are kept up to date by the converter).
+Links are followed from the roots through pages and stylesheets: href,
+src, poster and srcset attributes, and url() in CSS. Files the converter
+writes (post pages, images and their variants, videos) that can't be
+reached that way are removed; --dry-run only lists them.
+
+Only the converter's output directories are collected, so hand-maintained
+ones such as docs/assets/certificates are never touched. Post pages share
+their directory with hand-written ones, so a page there is only collected
+if it carries the converter's generator tag.
+"""
+import argparse
+import os
+import re
+from collections import deque
+from urllib.parse import unquote, urlsplit
+
+import assets
+import build_cache
+import convert_writeups
+
+# --- CONFIGURATION ---
+SITE_DIR = "docs"
+
+# Directories only the converter writes to; any file in them may be collected
+COLLECTED_DIRS = (assets.ASSETS_DIR, assets.VIDEOS_DIR)
+# Post pages, collected when they carry GENERATOR_TAG (see blog_template.html)
+PAGES_DIR = convert_writeups.HTML_OUTPUT_DIR
+GENERATOR_TAG = '<meta name="generator" content="convert_writeups">'
+
+PAGE_EXTENSIONS = {".html", ".htm"}
+# Files whose links are followed
+LINKING_EXTENSIONS = PAGE_EXTENSIONS | {".css"}
+
+LINK_ATTR_RE = re.compile(r"""\s(href|src|poster|srcset)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+))""", re.I)
+# Also finds the URLs in inline styles and inlined critical CSS
+CSS_URL_RE = re.compile(r"""url\(\s*(?:"([^"]*)"|'([^']*)'|([^)\s"']*))\s*\)""")
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def links(path, text):
+    """Returns the URLs a page or stylesheet links to."""
+    urls = [next(filter(None, groups), "") for groups in CSS_URL_RE.findall(text)]
+    if os.path.splitext(path)[1].lower() in PAGE_EXTENSIONS:
+        for attr, *values in LINK_ATTR_RE.findall(text):
+            value = next(filter(None, values), "")
+            if attr.lower() == "srcset":
+                # "url 480w, url 960w": the URL is each candidate's first word
+                urls.extend(candidate.split()[0] for candidate in value.split(",") if candidate.strip())
+            else:
+                urls.append(value)
+    return urls
+
+
+def resolve(url, base_path, site_dir=SITE_DIR):
+    """Returns the file under `site_dir` a URL in the file at `base_path`
+    points to, or None for external URLs and ones that lead elsewhere.
+    """
+    parts = urlsplit(url.strip())
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if path.startswith("/"):
+        target = os.path.join(site_dir, path.lstrip("/"))
+    else:
+        target = os.path.join(os.path.dirname(base_path), path)
+    target = os.path.normpath(target)
+    if os.path.isdir(target):
+        target = os.path.join(target, "index.html")
+    if os.path.commonpath([os.path.abspath(target), os.path.abspath(site_dir)]) != os.path.abspath(site_dir):
+        return None
+    return target
+
+
+def _within(path, directory):
+    return os.path.commonpath([path, directory]) == directory
+
+
+def find_garbage(site_dir=SITE_DIR, collected_dirs=COLLECTED_DIRS, pages_dir=PAGES_DIR):
+    """Returns the collectable files under `site_dir` that no root page
+    leads to, sorted.
+    """
+    files = set()
+    for root, _, names in os.walk(site_dir):
+        files.update(os.path.normpath(os.path.join(root, name)) for name in names)
+
+    texts = {}
+
+    def text(path):
+        if path not in texts:
+            texts[path] = read_text(path)
+        return texts[path]
+
+    collectable = set()
+    for path in files:
+        if any(_within(path, os.path.normpath(d)) for d in collected_dirs):
+            collectable.add(path)
+        elif (_within(path, os.path.normpath(pages_dir))
+              and os.path.splitext(path)[1].lower() in PAGE_EXTENSIONS and GENERATOR_TAG in text(path)):
+            collectable.add(path)
+
+    roots = [path for path in files - collectable if os.path.splitext(path)[1].lower() in PAGE_EXTENSIONS]
+    reached = set(roots)
+    queue = deque(roots)
+    while queue:
+        path = queue.popleft()
+        if os.path.splitext(path)[1].lower() not in LINKING_EXTENSIONS:
+            continue
+        for url in links(path, text(path)):
+            target = resolve(url, path, site_dir)
+            if target in files and target not in reached:
+                reached.add(target)
+                queue.append(target)
+
+    return sorted(collectable - reached)
+
+
+def collect_garbage(dry_run=False, site_dir=SITE_DIR):
+    """Removes (or, with `dry_run`, only lists) the unreachable outputs
+    under `site_dir`. Returns their paths.
+    """
+    garbage = find_garbage(site_dir)
+    size = 0
+    for path in garbage:
+        size += os.path.getsize(path)
+        if dry_run:
+            print(f"Would remove {path}")
+        else:
+            build_cache.remove_output(path)
+            print(f"Removed {path} (unreachable)")
+    verb = "Would remove" if dry_run else "Removed"
+    print(f"{verb} {len(garbage)} unreachable file(s), {size / 1024:.1f} KiB")
+    return garbage
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Remove build outputs in docs/ that no page links to.")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="list unreachable outputs without removing them")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    collect_garbage(args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
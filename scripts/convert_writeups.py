@@ -1,117 +1,129 @@
+import argparse
+import contextlib
+import json
 import os
 import re
-import shutil
-import markdown
-from jinja2 import Environment, FileSystemLoader
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from urllib.parse import quote, unquote
+import markdown
+
+import assets
+import build_cache
+import critical_css
+import icons
+import search_index
+import telemetry
+from catalogue import Catalogue
+from posts import get_all_posts, is_post_file, load_post, compute_read_time_from_lines, try_parse_date
+from update_blog_index import update_blog_index, CRITICAL_CSS_MARKER, ICON_SPRITE_MARKER
 
 # --- CONFIGURATION ---
 SRC_DIR = "blog-src"
 DEST_DIR = "docs/blog"
 HTML_OUTPUT_DIR = os.path.join(DEST_DIR, "html")
-ASSETS_DIR = "docs/assets/images/writeups"
+ASSETS_DIR = assets.ASSETS_DIR
 TEMPLATE_DIR = "scripts"
 TEMPLATE_NAME = "blog_template.html"
-BLOG_INDEX_FILE = os.path.join(DEST_DIR, "index.html")
+BLOG_ASSETS_DIR = os.path.join(SRC_DIR, "assets", "images")
 
+# Asset URLs as seen from a page in docs/blog/html
+ASSETS_URL = "../../assets/images/writeups"
+VARIANTS_URL = ASSETS_URL + "/variants"
 
-def get_post_title(markdown_content):
-    """Extracts the first H1 header from markdown content."""
-    match = re.search(r"^#\s+(.*)", markdown_content, re.MULTILINE)
-    if match:
-        return match.group(1)
-    return "Blog Post"
+# Maps every source asset to the fingerprinted file pages link to
+ASSET_MANIFEST = os.path.join(DEST_DIR, "asset-manifest.json")
 
+# The full post list for the sidebar, loaded by blog.js on every page
+SIDEBAR_MANIFEST = os.path.join(DEST_DIR, "posts.json")
+# Posts listed in each page's server-rendered sidebar, shown until (or
+# instead of, without JavaScript) the manifest is loaded
+SIDEBAR_FALLBACK_POSTS = 10
 
-def convert_obsidian_images(content, md_file_path):
-    """
-    Finds all Obsidian-style image links, copies the images from
-    blog-src/assets/images (or relative paths) to the assets
-    directory, and replaces the links with standard markdown links.
-    """
+# Post figures fill the content column, which tops out at about 770px
+FIGURE_SIZES = "(max-width: 768px) 100vw, 770px"
 
-    image_pattern = r"!\[\[(.*?)\]\]"
+# How much of an embedded video browsers fetch before it is played:
+# "metadata" (its duration and first frame) or "none". Embeds that set
+# their own preload attribute keep it.
+VIDEO_PRELOAD = "metadata"
 
-    BLOG_ASSETS_DIR = os.path.join(SRC_DIR, "assets", "images")
+# Bump whenever a change to this script alters the generated HTML, so
+# cached outputs from older builds are invalidated.
+CONVERTER_VERSION = "8"
+
+OBSIDIAN_IMAGE_RE = re.compile(r"!\[\[(.*?)\]\]")
+# URLs in a post: src and href attributes, and markdown link and image
+# targets (optionally in <angle brackets>)
+LINK_TARGET_RE = re.compile(r"""\b(?:src|href)\s*=\s*(?:"([^"]*)"|'([^']*)')|\]\(\s*(?:<([^>]*)>|([^)\s]+))""", re.I)
+# A URL into the videos directory, by its path in there
+VIDEO_URL_RE = re.compile(r"(?:^|/)assets/videos/([^?#]+)")
+VIDEO_TAG_RE = re.compile(r"<video\b(?![^>]*\bpreload\s*=)", re.I)
 
-    def replace_link(match):
-        image_ref = match.group(1).strip()
 
-        candidate_paths = [
-            os.path.join(os.path.dirname(md_file_path), image_ref),
-            os.path.join(BLOG_ASSETS_DIR, image_ref),
-            os.path.join(BLOG_ASSETS_DIR, os.path.basename(image_ref)),
-        ]
+def convert_obsidian_images(content, md_file_path, image_names):
+    """
+    Finds all Obsidian-style image links whose image could not be found
+    and replaces them with a visible placeholder. `image_names` maps each
+    image reference to its filename in the asset store (see assets.py);
+    the other links are turned into figures pointing there by
+    process_figures(), and copying the files is done separately by
+    assets.sync_assets().
+    """
 
-        src_image_path = next((p for p in candidate_paths if os.path.exists(p)), None)
+    def replace_link(match):
+        image_ref = match.group(1).strip()
 
-        if not src_image_path:
+        if image_ref not in image_names:
             print(f"Warning: Image not found for {image_ref} in {md_file_path}")
             return f"![Image not found: {image_ref}]"
 
-        os.makedirs(ASSETS_DIR, exist_ok=True)
-        dest_filename = os.path.basename(src_image_path)
-        dest_image_path = os.path.join(ASSETS_DIR, dest_filename)
+        return match.group(0)
 
-        shutil.copy(src_image_path, dest_image_path)
+    return OBSIDIAN_IMAGE_RE.sub(replace_link, content)
 
-        return f"![](../../assets/images/writeups/{dest_filename})"
 
-    return re.sub(image_pattern, replace_link, content)
-
-
-def extract_metadata(markdown_content):
-    """Extract simple metadata lines like Title, Date, Author, Tags from the top of the markdown.
-    Returns a dict and the markdown with those metadata lines removed.
+def resolve_image_path(image_ref, md_file_path):
+    """Returns the source path of an Obsidian image reference, looking next
+    to the markdown file first and then in blog-src/assets/images.
+    Returns None when the image cannot be found.
     """
-    meta = {}
-    lines = markdown_content.splitlines()
-    remaining_lines = []
+    candidate_paths = [
+        os.path.join(os.path.dirname(md_file_path), image_ref),
+        os.path.join(BLOG_ASSETS_DIR, image_ref),
+        os.path.join(BLOG_ASSETS_DIR, os.path.basename(image_ref)),
+    ]
+    return next((p for p in candidate_paths if os.path.exists(p)), None)
 
-    meta_re = re.compile(r'^(Title|Date|Author|Tags|Read_time)\s*:\s*(.*)$', re.IGNORECASE)
-
-    for line in lines:
-        m = meta_re.match(line.strip())
-        if m:
-            key = m.group(1).strip().lower()
-            value = m.group(2).strip().strip('"')
-            # Normalize tags (simple comma/ bracket handling)
-            if key == 'tags':
-                # remove surrounding brackets if present
-                v = value
-                v = v.strip()
-                if v.startswith('[') and v.endswith(']'):
-                    v = v[1:-1]
-                meta['tags'] = [t.strip() for t in re.split(r',\s*', v) if t.strip()]
-            else:
-                meta[key] = value
-            # Skip writing this line into remaining content (we remove metadata lines)
-        else:
-            remaining_lines.append(line)
 
-    cleaned = "\n".join(remaining_lines)
-    return meta, cleaned
+def find_image_refs(content):
+    """Returns the Obsidian image references in a markdown document, in order."""
+    return [m.group(1).strip() for m in OBSIDIAN_IMAGE_RE.finditer(content)]
 
 
-def compute_read_time_from_lines(markdown_content, lines_per_min=20):
-    """Simple read time estimate based on number of lines in the markdown.
-    Defaults to 20 lines per minute; always returns at least 1 minute.
+def find_video_refs(content):
+    """Returns the files a markdown document embeds or links to from the
+    videos directory, as paths relative to it, in order. URLs inside code
+    blocks and code spans are examples, not links, and paths leading out
+    of the directory are ignored.
     """
-    if not markdown_content:
-        return "1 min read"
-    num_lines = markdown_content.count('\n') + 1
-    minutes = max(1, round(num_lines / float(lines_per_min)))
-    return f"{minutes} min read"
+    text = INLINE_CODE_RE.sub("", FENCED_CODE_RE.sub("", content))
+    refs = []
+    for m in LINK_TARGET_RE.finditer(text):
+        url = VIDEO_URL_RE.search(next(filter(None, m.groups()), ""))
+        if not url:
+            continue
+        ref = os.path.normpath(unquote(url.group(1)))
+        if not ref.startswith(("..", "/")) and ref not in refs:
+            refs.append(ref)
+    return refs
 
 
-def extract_challenge_metadata(markdown_content):
-    """Parse markdown bullet lines like '- **Key:** Value' into a dict."""
-    challenge = {}
-    for m in re.finditer(r"^\s*-\s*\*\*(.+?)\*\*\s*:\s*(.+)$", markdown_content, re.MULTILINE):
-        key = m.group(1).strip().lower().replace(' ', '_')
-        val = m.group(2).strip()
-        challenge[key] = val
-    return challenge
+def add_video_preload(html):
+    """Gives the <video> elements of an HTML fragment a preload attribute
+    of VIDEO_PRELOAD, unless they set their own.
+    """
+    return VIDEO_TAG_RE.sub(f'<video preload="{VIDEO_PRELOAD}"', html)
 
 
 def remove_leading_h1(markdown_content):
@@ -127,594 +139,690 @@ def remove_leading_h1(markdown_content):
             continue
         new_lines.append(line)
     return "\n".join(new_lines)
-def update_blog_index(posts):
-    """Updates the blog index file with a list of posts."""
-    with open(BLOG_INDEX_FILE, "r") as f:
-        index_content = f.read()
-
-        post_list_html = ""
-        for post in posts:
-                # Build simple tag HTML with per-tag classes
-                tags_html = ""
-                if post.get('tags'):
-                        tags_html = ' '.join([f"<span class=\"tag tag-{t.lower().replace(' ','-')}\">{t}</span>" for t in post.get('tags')])
-
-                # Difficulty badge
-                difficulty_html = ''
-                if post.get('difficulty'):
-                        difficulty_html = f"<span class=\"meta-item difficulty difficulty-{post.get('difficulty').lower()}\">{post.get('difficulty')}</span>"
-
-                post_list_html += f"""
-            <article class=\"blog-card\"> 
-                <a href=\"{post['url']}\" class=\"blog-card-content\"> 
-                    <div class=\"blog-card-date\"><i class=\"fas fa-calendar-alt\"></i> {post.get('date','')}</div>
-                    <h2 class=\"blog-card-title\">{post['title']}</h2>
-                    <div style=\"display:flex;gap:0.75rem;align-items:center;margin-top:0.5rem;flex-wrap:wrap;\"> 
-                        <span class=\"blog-meta\"><i class=\"fas fa-clock\"></i> {post.get('read_time','')} </span>
-                        <span class=\"blog-meta\"><i class=\"fas fa-user\"></i> {post.get('author','')}</span>
-                        {difficulty_html}
-                        <span style=\"margin-left:0.25rem;\">{tags_html}</span>
-                    </div>
-                    <!--<span class=\"read-more blog-card-link\"> <i class=\"fas fa-arrow-right\"></i></span>-->
-                </a>
-            </article>
-        """
-
-    start_tag_re = re.search(r'<section[^>]*class=["\'][^"\']*blog-grid[^"\']*["\'][^>]*>', index_content)
-    if not start_tag_re:
-        print(f"Warning: Could not find blog-grid section start in {BLOG_INDEX_FILE}")
-        return
-
-    start_index = start_tag_re.end()
-    end_index = index_content.find('</section>', start_index)
-    if end_index == -1:
-        print(f"Warning: Could not find closing </section> in {BLOG_INDEX_FILE}")
-        return
-
-    new_index_content = index_content[:start_index] + '\n' + post_list_html + index_content[end_index:]
-
-    with open(BLOG_INDEX_FILE, "w") as f:
-        f.write(new_index_content)
-
-    print(f"Updated blog index at {BLOG_INDEX_FILE}")
-
-
-def get_all_posts():
-    """Returns a list of all blog posts."""
-    md_files = [f for f in os.listdir(SRC_DIR) if f.endswith(".md")]
-    # Exclude helper/template markdown files (including hidden template files)
-    md_files = [f for f in md_files if 'template' not in f.lower() and not f.startswith('.')]
-
-    posts = []
-
-    for md_file in md_files:
-        md_file_path = os.path.join(SRC_DIR, md_file)
-        with open(md_file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        meta, cleaned = extract_metadata(content)
-        challenge_meta = extract_challenge_metadata(cleaned)
-        title = meta.get('title') or get_post_title(content)
-        output_filename = os.path.splitext(md_file)[0] + ".html"
-
-        posts.append({
-            "title": title,
-            "url": f"html/{output_filename}",
-            "date": meta.get('date',''),
-            "author": meta.get('author',''),
-            "tags": meta.get('tags',[]),
-            "read_time": compute_read_time_from_lines(cleaned),
-            "difficulty": challenge_meta.get('difficulty','')
-        })
-
-    # Make ordering deterministic: prefer date (descending), then title
-    def try_parse_date(d):
-        if not d:
-            return datetime.min
-        fmts = ["%B %d, %Y", "%Y-%m-%d", "%d %B %Y", "%b %d, %Y"]
-        for f in fmts:
-            try:
-                return datetime.strptime(d, f)
-            except Exception:
-                continue
-        m = re.search(r"(19|20)\d{2}", d)
-        if m:
-            try:
-                return datetime(int(m.group(0)), 1, 1)
-            except Exception:
-                return datetime.min
-        return datetime.min
 
-    try:
-        posts.sort(key=lambda p: try_parse_date(p.get('date','')), reverse=True)
-    except Exception:
-        posts.sort(key=lambda p: (p.get('title') or ''))
 
-    return posts
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables"]
 
+_template = None
+_markdown = None
 
-def main():
-    os.makedirs(HTML_OUTPUT_DIR, exist_ok=True)
-    os.makedirs(ASSETS_DIR, exist_ok=True)
 
-    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-    template = env.get_template(TEMPLATE_NAME)
-
-    all_posts = get_all_posts()
-
-    posts_html = ""
-    for post in all_posts:
-        post_filename = os.path.basename(post["url"])
-        posts_html += f'<li><a href="{post_filename}"><i class="fas fa-file-alt"></i> {post["title"]}</a></li>'
-
-    # Ensure we generate posts in a stable, predictable order and skip template.md
-    md_files = sorted([f for f in os.listdir(SRC_DIR) if f.endswith(".md") and 'template' not in f.lower() and not f.startswith('.')])
-
-    generated_posts = []
-
-    for post_idx, md_file in enumerate(md_files, start=1):
-        md_file_path = os.path.join(SRC_DIR, md_file)
-
-        with open(md_file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        # First convert obsidian-style images and extract metadata lines
-        content_with_images = convert_obsidian_images(content, md_file_path)
-        meta, cleaned_content = extract_metadata(content_with_images)
-
-        # Title preference: metadata Title else first H1
-        title = meta.get('title') or get_post_title(content_with_images)
-
-        # Remove leading H1 from content so template title doesn't duplicate it
-        cleaned_no_h1 = remove_leading_h1(cleaned_content)
-
-        # Process figures: replace markdown image syntax, Obsidian images, and HTML <img> with <figure> blocks and generate ids
-        def process_figures(md_text, post_index):
-            fig_i = 1
-            placeholders = {}
-            mapping = {}
-
-            # Protect fenced code blocks and inline code by replacing with placeholders
-            code_placeholders = {}
-            cp_i = 0
-            def mask_code(text):
-                nonlocal cp_i
-                def fenced_repl(m):
-                    nonlocal cp_i
-                    key = f"__CODE_BLOCK_{cp_i}__"
-                    code_placeholders[key] = m.group(0)
-                    cp_i += 1
-                    return key
-                text = re.sub(r'```[\s\S]*?```', fenced_repl, text)
-
-                def inline_repl(m):
-                    nonlocal cp_i
-                    key = f"__INLINE_CODE_{cp_i}__"
-                    code_placeholders[key] = m.group(0)
-                    cp_i += 1
-                    return key
-                text = re.sub(r'`[^`]*`', inline_repl, text)
-                return text
-
-            def unmask_code(text):
-                for k, v in code_placeholders.items():
-                    text = text.replace(k, v)
-                return text
-
-            masked = mask_code(md_text)
-
-            # Normalize Obsidian-style ![[name]] to markdown-like references
-            masked = re.sub(r'!\[\[(.*?)\]\]', lambda m: f'![]({m.group(1).strip()})', masked)
-
-            # Helper to create a placeholder for a figure and record mapping
-            def make_placeholder_for_img(src, alt, original_img_tag=None):
-                nonlocal fig_i
-                fig_id = f"fig-{post_index}-{fig_i}"
-                caption = f"Fig{post_index}.{fig_i} - {alt}"
-                if original_img_tag:
-                    html = f'<figure class="post-figure" id="{fig_id}">\n  {original_img_tag}\n  <figcaption>{caption}</figcaption>\n</figure>'
-                else:
-                    html = f'<figure class="post-figure" id="{fig_id}">\n  <img src="{src}" alt="{alt}"/>\n  <figcaption>{caption}</figcaption>\n</figure>'
-                placeholder = f"__FIG_PLACEHOLDER_{fig_i}__"
-                placeholders[placeholder] = html
-                mapping[os.path.basename(src)] = (fig_id, caption, placeholder)
-                fig_i += 1
-                return placeholder
-
-            # Replace markdown images ![alt](src) with placeholders
-            def md_img_repl(m):
-                alt = m.group(1).strip() or os.path.splitext(os.path.basename(m.group(2).strip()))[0]
-                src = m.group(2).strip()
-                return make_placeholder_for_img(src, alt)
-            masked = re.sub(r'!\[(.*?)\]\((.*?)\)', md_img_repl, masked)
-
-            # Replace HTML <img ...> tags with placeholders, preserving original tag
-            def html_img_repl(m):
-                full_tag = m.group(0)
-                attrs = m.group(1)
-                src_m = re.search(r'src\s*=\s*"([^\"]+)"', attrs)
-                alt_m = re.search(r'alt\s*=\s*"([^\"]+)"', attrs)
-                src = src_m.group(1) if src_m else ''
-                alt = alt_m.group(1) if alt_m else os.path.splitext(os.path.basename(src))[0]
-                return make_placeholder_for_img(src, alt, full_tag)
-            masked = re.sub(r'<img\s+([^>]+?)\s*/?>', html_img_repl, masked)
-
-            # Replace bare mentions of the image filename with links to the figure, but only in text nodes
-            parts = re.split(r'(<[^>]+>)', masked)
-            for i, part in enumerate(parts):
-                if i % 2 == 0:
-                    for basename, (fid, caption, placeholder) in mapping.items():
-                        part = re.sub(rf'\b{re.escape(basename)}\b', f'<a href="#'+fid+f'">{caption}</a>', part)
-                    parts[i] = part
-            masked = ''.join(parts)
-
-            # Replace placeholders with actual figure HTML
-            for placeholder, html in placeholders.items():
-                masked = masked.replace(placeholder, html)
-
-            final = unmask_code(masked)
-            simple_map = {k: (v[0], v[1]) for k, v in mapping.items()}
-            return final, simple_map
-
-        cleaned_no_h1, figures = process_figures(cleaned_no_h1, post_idx)
-
-        # Compute read time from cleaned content (metadata removed)
-        read_time = compute_read_time_from_lines(cleaned_no_h1)
-
-        # Extract challenge-specific metadata from the body (Room Name, Difficulty, Category)
-        challenge_meta = extract_challenge_metadata(cleaned_no_h1)
-        challenge_name = challenge_meta.get('room_name') or challenge_meta.get('room') or ''
-
-        html_fragment = markdown.markdown(cleaned_no_h1, extensions=["fenced_code", "tables"])
-
-        final_html = template.render(
-            title=title,
-            content=html_fragment,
-            posts=posts_html,
-            page_date=meta.get('date',''),
-            page_author=meta.get('author',''),
-            page_tags=meta.get('tags',[]),
-            read_time=read_time,
-            challenge=challenge_meta,
-            challenge_name=challenge_name
-        )
-
-        output_filename = os.path.splitext(md_file)[0] + ".html"
-        output_path = os.path.join(HTML_OUTPUT_DIR, output_filename)
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(final_html)
-
-        print(f"Converted {md_file} -> {output_path}")
-
-        generated_posts.append({
-            "title": title,
-            "url": f"html/{output_filename}",
-            "date": meta.get('date',''),
-            "author": meta.get('author',''),
-            "tags": meta.get('tags',[]),
-            "read_time": read_time
-        })
-
-    if generated_posts:
-        update_blog_index(generated_posts)
+def get_template():
+    """Returns the blog page template, loading it once per process."""
+    global _template
+    if _template is None:
+        _template = build_cache.template_environment(TEMPLATE_DIR).get_template(TEMPLATE_NAME)
+    return _template
 
 
-if __name__ == "__main__":
-    main()
-import os
-import re
-import shutil
-import markdown
-from jinja2 import Environment, FileSystemLoader
+def markdown_to_html(text):
+    """Converts markdown to HTML with one Markdown instance per process,
+    reset between documents, instead of building and registering the
+    extensions again for every post.
+    """
+    global _markdown
+    if _markdown is None:
+        _markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return _markdown.reset().convert(text)
 
-# --- CONFIGURATION ---
-SRC_DIR = "blog-src"
-DEST_DIR = "docs/blog"
-HTML_OUTPUT_DIR = os.path.join(DEST_DIR, "html")
-ASSETS_DIR = "docs/assets/images/writeups"
-TEMPLATE_DIR = "scripts"
-TEMPLATE_NAME = "blog_template.html"
-BLOG_INDEX_FILE = os.path.join(DEST_DIR, "index.html")
-
-
-def get_post_title(markdown_content):
-    """Extracts the first H1 header from markdown content."""
-    match = re.search(r"^#\s+(.*)", markdown_content, re.MULTILINE)
-    if match:
-        def process_figures(md_text, post_index):
-            fig_i = 1
-            placeholders = {}
-            mapping = {}
-
-            # Protect fenced code blocks and inline code by replacing with placeholders
-            code_placeholders = {}
-            cp_i = 0
-            def mask_code(text):
-                nonlocal cp_i
-                def fenced_repl(m):
-                    nonlocal cp_i
-                    key = f"__CODE_BLOCK_{cp_i}__"
-                    code_placeholders[key] = m.group(0)
-                    cp_i += 1
-                    return key
-                text = re.sub(r'```[\s\S]*?```', fenced_repl, text)
-
-                def inline_repl(m):
-                    nonlocal cp_i
-                    key = f"__INLINE_CODE_{cp_i}__"
-                    code_placeholders[key] = m.group(0)
-                    cp_i += 1
-                    return key
-                text = re.sub(r'`[^`]*`', inline_repl, text)
-                return text
-
-            def unmask_code(text):
-                for k, v in code_placeholders.items():
-                    text = text.replace(k, v)
-                return text
-
-            masked = mask_code(md_text)
-
-            # Normalize Obsidian-style ![[name]] to markdown-like references
-            masked = re.sub(r'!\[\[(.*?)\]\]', lambda m: f'![]({m.group(1).strip()})', masked)
-
-            # Helper to create a placeholder for a figure and record mapping
-            def make_placeholder_for_img(src, alt, original_img_tag=None):
-                nonlocal fig_i
-                fig_id = f"fig-{post_index}-{fig_i}"
-                caption = f"Fig{post_index}.{fig_i} - {alt}"
-                if original_img_tag:
-                    html = f'<figure class="post-figure" id="{fig_id}">\n  {original_img_tag}\n  <figcaption>{caption}</figcaption>\n</figure>'
-                else:
-                    html = f'<figure class="post-figure" id="{fig_id}">\n  <img src="{src}" alt="{alt}"/>\n  <figcaption>{caption}</figcaption>\n</figure>'
-                placeholder = f"__FIG_PLACEHOLDER_{fig_i}__"
-                placeholders[placeholder] = html
-                mapping[os.path.basename(src)] = (fig_id, caption, placeholder)
-                fig_i += 1
-                return placeholder
-
-            # Replace markdown images ![alt](src) with placeholders
-            def md_img_repl(m):
-                alt = m.group(1).strip() or os.path.splitext(os.path.basename(m.group(2).strip()))[0]
-                src = m.group(2).strip()
-                return make_placeholder_for_img(src, alt)
-            masked = re.sub(r'!\[(.*?)\]\((.*?)\)', md_img_repl, masked)
-
-            # Replace HTML <img ...> tags with placeholders, preserving original tag
-            def html_img_repl(m):
-                def process_figures(md_text, post_index):
-                    fig_i = 1
-                    placeholders = {}
-                    mapping = {}
-
-                    # Protect fenced code blocks and inline code by replacing with placeholders
-                    code_placeholders = {}
-                    cp_i = 0
-                    def mask_code(text):
-                        nonlocal cp_i
-                        def fenced_repl(m):
-                            nonlocal cp_i
-                            key = f"__CODE_BLOCK_{cp_i}__"
-                            code_placeholders[key] = m.group(0)
-                            cp_i += 1
-                            return key
-                        text = re.sub(r'```[\s\S]*?```', fenced_repl, text)
-
-                        def inline_repl(m):
-                            nonlocal cp_i
-                            key = f"__INLINE_CODE_{cp_i}__"
-                            code_placeholders[key] = m.group(0)
-                            cp_i += 1
-                            return key
-                        text = re.sub(r'`[^`]*`', inline_repl, text)
-                        return text
-
-                    def unmask_code(text):
-                        for k, v in code_placeholders.items():
-                            text = text.replace(k, v)
-                        return text
-
-                    masked = mask_code(md_text)
-
-                    # Normalize Obsidian-style ![[name]] to markdown-like references
-                    masked = re.sub(r'!\[\[(.*?)\]\]', lambda m: f'![]({m.group(1).strip()})', masked)
-
-                    # Helper to create a placeholder for a figure and record mapping
-                    def make_placeholder_for_img(src, alt, original_img_tag=None):
-                        nonlocal fig_i
-                        fig_id = f"fig-{post_index}-{fig_i}"
-                        caption = f"Fig{post_index}.{fig_i} - {alt}"
-                        if original_img_tag:
-                            html = f'<figure class="post-figure" id="{fig_id}">\n  {original_img_tag}\n  <figcaption>{caption}</figcaption>\n</figure>'
-                        else:
-                            html = f'<figure class="post-figure" id="{fig_id}">\n  <img src="{src}" alt="{alt}"/>\n  <figcaption>{caption}</figcaption>\n</figure>'
-                        placeholder = f"__FIG_PLACEHOLDER_{fig_i}__"
-                        placeholders[placeholder] = html
-                        mapping[os.path.basename(src)] = (fig_id, caption, placeholder)
-                        fig_i += 1
-                        return placeholder
-
-                    # Replace markdown images ![alt](src) with placeholders
-                    def md_img_repl(m):
-                        alt = m.group(1).strip() or os.path.splitext(os.path.basename(m.group(2).strip()))[0]
-                        src = m.group(2).strip()
-                        return make_placeholder_for_img(src, alt)
-                    masked = re.sub(r'!\[(.*?)\]\((.*?)\)', md_img_repl, masked)
-
-                    # Replace HTML <img ...> tags with placeholders, preserving original tag
-                    def html_img_repl(m):
-                        full_tag = m.group(0)
-                        attrs = m.group(1)
-                        src_m = re.search(r'src\s*=\s*"([^\"]+)"', attrs)
-                        alt_m = re.search(r'alt\s*=\s*"([^\"]+)"', attrs)
-                        src = src_m.group(1) if src_m else ''
-                        alt = alt_m.group(1) if alt_m else os.path.splitext(os.path.basename(src))[0]
-                        return make_placeholder_for_img(src, alt, full_tag)
-                    masked = re.sub(r'<img\s+([^>]+?)\s*/?>', html_img_repl, masked)
-
-                    # Replace bare mentions of the image filename with links to the figure, but only in text nodes
-                    parts = re.split(r'(<[^>]+>)', masked)
-                    for i, part in enumerate(parts):
-                        if i % 2 == 0:
-                            for basename, (fid, caption, placeholder) in mapping.items():
-                                part = re.sub(rf'\b{re.escape(basename)}\b', f'<a href="#'+fid+f'">{caption}</a>', part)
-                            parts[i] = part
-                    masked = ''.join(parts)
-
-                    # Replace placeholders with actual figure HTML
-                    for placeholder, html in placeholders.items():
-                        masked = masked.replace(placeholder, html)
-
-                    final = unmask_code(masked)
-                    simple_map = {k: (v[0], v[1]) for k, v in mapping.items()}
-                    return final, simple_map
-
-            # 1) Convert Obsidian-style image links ![[name]] -> markdown image syntax (if not already converted)
-            def obsidian_repl(m):
-                inner = m.group(1).strip()
-                # leave as markdown-like reference; convert_obsidian_images will have already handled file copying
-                return f'![]({inner})'
-            masked = re.sub(r'!\[\[(.*?)\]\]', obsidian_repl, masked)
-
-            # 2) Replace markdown images ![alt](src)
-            def md_img_repl(m):
-                alt = m.group(1).strip() or os.path.splitext(os.path.basename(m.group(2).strip()))[0]
-                src = m.group(2).strip()
-                return build_figure(src, alt)
-            masked = re.sub(r'!\[(.*?)\]\((.*?)\)', md_img_repl, masked)
-
-            # 3) Replace HTML <img ...> tags
-            def html_img_repl(m):
-                attrs = m.group(1)
-                # find src and alt
-                src_m = re.search(r'src\s*=\s*"([^"]+)"', attrs)
-                alt_m = re.search(r'alt\s*=\s*"([^"]+)"', attrs)
-                src = src_m.group(1) if src_m else ''
-                alt = alt_m.group(1) if alt_m else os.path.splitext(os.path.basename(src))[0]
-                return build_figure(src, alt)
-            masked = re.sub(r'<img\s+([^>]+?)\s*/?>', html_img_repl, masked)
-
-            # 4) Replace bare mentions of the image filename with links to the figure,
-            # but only in text nodes (not inside HTML tags/attributes) to avoid breaking src attributes.
-            parts = re.split(r'(<[^>]+>)', masked)
-            for i, part in enumerate(parts):
-                # even indices are text outside tags
-                if i % 2 == 0:
-                    for basename, (fid, caption) in mapping.items():
-                        part = re.sub(rf'\b{re.escape(basename)}\b', f'<a href="#{fid}">{caption}</a>', part)
-                    parts[i] = part
-
-            masked = mask_code(md_text)
-
-            # helper to build figure html and a placeholder mapping so we don't replace inside generated HTML
-            placeholders = {}
-
-            def build_figure_and_placeholder(src, alt):
-                nonlocal fig_i
-                fig_id = f"fig-{post_index}-{fig_i}"
-                caption = f"Fig{post_index}.{fig_i} - {alt}"
-                html = f'<figure class="post-figure" id="{fig_id}">\n  <img src="{src}" alt="{alt}"/>\n  <figcaption>{caption}</figcaption>\n</figure>'
-                placeholder = f"__FIG_PLACEHOLDER_{fig_i}__"
-                placeholders[placeholder] = html
-                mapping[os.path.basename(src)] = (fig_id, caption, placeholder)
-                fig_i += 1
-                return placeholder
-
-            # 1) Convert Obsidian-style image links ![[name]] -> markdown-like, but will be handled below
-            def obsidian_repl(m):
-                inner = m.group(1).strip()
-                return f'![]({inner})'
-            masked = re.sub(r'!\[\[(.*?)\]\]', obsidian_repl, masked)
-
-            # 2) Replace markdown images ![alt](src) with placeholders
-            def md_img_repl(m):
-                alt = m.group(1).strip() or os.path.splitext(os.path.basename(m.group(2).strip()))[0]
-                src = m.group(2).strip()
-                return build_figure_and_placeholder(src, alt)
-            masked = re.sub(r'!\[(.*?)\]\((.*?)\)', md_img_repl, masked)
-
-            # 3) Replace HTML <img ...> tags with placeholders
-            def html_img_repl(m):
-                full_tag = m.group(0)
-                attrs = m.group(1)
-                src_m = re.search(r'src\s*=\s*"([^"]+)"', attrs)
-                alt_m = re.search(r'alt\s*=\s*"([^"]+)"', attrs)
-                src = src_m.group(1) if src_m else ''
-                alt = alt_m.group(1) if alt_m else os.path.splitext(os.path.basename(src))[0]
-                # Build figure that contains the original img tag to preserve attributes
-                nonlocal fig_i
-                fig_id = f"fig-{post_index}-{fig_i}"
-                caption = f"Fig{post_index}.{fig_i} - {alt}"
-                html = f'<figure class="post-figure" id="{fig_id}">\n  {full_tag}\n  <figcaption>{caption}</figcaption>\n</figure>'
-                placeholder = f"__FIG_PLACEHOLDER_{fig_i}__"
-                placeholders[placeholder] = html
-                mapping[os.path.basename(src)] = (fig_id, caption, placeholder)
-                fig_i += 1
-                return placeholder
-            masked = re.sub(r'<img\s+([^>]+?)\s*/?>', html_img_repl, masked)
-
-            # 4) Replace bare mentions of the image filename with links to the figure, only in text nodes
-            parts = re.split(r'(<[^>]+>)', masked)
-            for i, part in enumerate(parts):
-                if i % 2 == 0:
-                    for basename, (fid, caption, placeholder) in mapping.items():
-                        part = re.sub(rf'\b{re.escape(basename)}\b', f'<a href="#{fid}">{caption}</a>', part)
-                    parts[i] = part
-
-            masked = ''.join(parts)
-
-            # 5) Replace placeholders with actual figure HTML
-            for placeholder, html in placeholders.items():
-                masked = masked.replace(placeholder, html)
-
-            final = unmask_code(masked)
-            # convert mapping values to fid,caption only for caller convenience
-            simple_map = {k: (v[0], v[1]) for k, v in mapping.items()}
-            return final, simple_map
-
-        cleaned_no_h1, figures = process_figures(cleaned_no_h1, post_idx)
-
-        # Compute read time from cleaned content (metadata removed)
-        read_time = compute_read_time_from_lines(cleaned_no_h1)
-
-        # Extract challenge-specific metadata from the body (Room Name, Difficulty, Category)
-        challenge_meta = extract_challenge_metadata(cleaned_no_h1)
-        challenge_name = challenge_meta.get('room_name') or challenge_meta.get('room') or ''
-
-        html_fragment = markdown.markdown(cleaned_no_h1, extensions=["fenced_code", "tables"])
-
-        final_html = template.render(
-            title=title,
-            content=html_fragment,
-            posts=posts_html,
-            page_date=meta.get('date',''),
-            page_author=meta.get('author',''),
-            page_tags=meta.get('tags',[]),
-            read_time=read_time,
-            challenge=challenge_meta,
-            challenge_name=challenge_name
-        )
-
-        output_filename = os.path.splitext(md_file)[0] + ".html"
-        output_path = os.path.join(HTML_OUTPUT_DIR, output_filename)
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(final_html)
-
-        print(f"Converted {md_file} -> {output_path}")
-
-        generated_posts.append({
-            "title": title,
-            "url": f"html/{output_filename}",
-            "date": meta.get('date',''),
-            "author": meta.get('author',''),
-            "tags": meta.get('tags',[]),
-            "read_time": read_time
-        })
-
-    if generated_posts:
-        update_blog_index(generated_posts)
+
+def picture_html(img_tag, variant_files):
+    """Wraps an <img> tag in a <picture> offering the responsive WebP
+    variants of the image, keeping the original file as the fallback.
+    """
+    srcset = ", ".join(f"{VARIANTS_URL}/{quote(filename)} {width}w" for width, filename in variant_files)
+    # Kept on one line so the figure's line count (and the read time) is unchanged
+    return f'<picture><source type="image/webp" srcset="{srcset}" sizes="{FIGURE_SIZES}"/>{img_tag}</picture>'
+
+
+def add_img_attrs(img_tag, attrs):
+    """Adds attributes to an <img> tag, keeping any the tag already sets."""
+    extra = "".join(
+        f' {name}="{value}"' for name, value in attrs.items()
+        if not re.search(rf'\s{name}\s*=', img_tag)
+    )
+    if not extra:
+        return img_tag
+    if img_tag.endswith("/>"):
+        return img_tag[:-2].rstrip() + extra + "/>"
+    return img_tag[:-1].rstrip() + extra + ">"
+
+
+# Code is masked in two linear passes, fences before inline spans, and the
+# remaining text is then scanned once for every kind of figure.
+FENCED_CODE_RE = re.compile(r'```[\s\S]*?```')
+INLINE_CODE_RE = re.compile(r'`[^`]*`')
+FIGURE_TOKEN_RE = re.compile(r"""
+    !\[\[(?P<obsidian>.*?)\]\]
+  | !\[(?P<alt>.*?)\]\((?P<src>.*?)\)
+  | (?P<img><img\s+(?P<attrs>[^>]+?)\s*/?>)
+""", re.VERBOSE)
+HTML_TAG_SPLIT_RE = re.compile(r'(<[^>]+>)')
+# Placeholders start and end with a word character, like the text they
+# replace usually does, and carry NULs so they can't clash with real text.
+TOKEN_PLACEHOLDER_RE = re.compile(r'_\x00(\d+)\x00_')
+
+
+def trie_pattern(words):
+    """Builds a regex alternation matching any of `words`, factored by common
+    prefixes so matching costs the length of the word rather than the number
+    of words. Longer words are preferred over their prefixes.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def process_figures(md_text, post_index, images=None):
+    """Replaces markdown image syntax, Obsidian images, and HTML <img> with <figure> blocks
+    and generates ids. `images` maps image srcs, as written in the post
+    (Obsidian references included), to what the build knows about them:
+    the "url" the stored file is served from, intrinsic "width"/"height"
+    and responsive variant "files". Captions and mentions use the file
+    name the post wrote, even when several names share one stored file.
+    Returns the processed markdown and a map of image name ->
+    (figure id, caption).
+
+    The document is tokenized up front: code spans and figures are swapped
+    for placeholders in linear scans, bare mentions of figure filenames in the
+    remaining text are linked with one combined pattern, and placeholders
+    are expanded again in one final pass.
+    """
+    images = images or {}
+    tokens = []
+    md_figures = []
+    html_figures = []
+
+    def placeholder(value):
+        tokens.append(value)
+        return f"_\x00{len(tokens) - 1}\x00_"
+
+    def expand(m):
+        token = tokens[int(m.group(1))]
+        return token[0] if isinstance(token, list) else token
+
+    def image_name(src):
+        return os.path.basename(src)
+
+    def figure(figures, src, alt, original_img_tag=None):
+        spec = [src, alt, original_img_tag]
+        figures.append(spec)
+        return placeholder(spec)
+
+    def token_repl(m):
+        if m.group("obsidian") is not None:
+            # Obsidian-style ![[name]] is treated like ![](name)
+            src = m.group("obsidian").strip()
+            return figure(md_figures, src, os.path.splitext(image_name(src))[0])
+        if m.group("src") is not None:
+            src = m.group("src").strip()
+            alt = m.group("alt").strip() or os.path.splitext(image_name(src))[0]
+            return figure(md_figures, src, alt)
+        # HTML <img ...> tags keep their original markup
+        attrs = m.group("attrs")
+        src_m = re.search(r'src\s*=\s*"([^\"]+)"', attrs)
+        alt_m = re.search(r'alt\s*=\s*"([^\"]+)"', attrs)
+        src = src_m.group(1) if src_m else ''
+        alt = alt_m.group(1) if alt_m else os.path.splitext(image_name(src))[0]
+        return figure(html_figures, src, alt, m.group("img"))
+
+    # Protect fenced code blocks and inline code
+    masked = FENCED_CODE_RE.sub(lambda m: placeholder(m.group(0)), md_text)
+    # An inline span can swallow a fence placeholder when backticks are
+    # unbalanced; keep the original text inside it
+    masked = INLINE_CODE_RE.sub(lambda m: placeholder(TOKEN_PLACEHOLDER_RE.sub(expand, m.group(0))), masked)
+    masked = FIGURE_TOKEN_RE.sub(token_repl, masked)
+
+    # Markdown and Obsidian images are numbered before HTML <img> tags
+    mapping = {}
+    for fig_i, spec in enumerate(md_figures + html_figures, start=1):
+        src, alt, original_img_tag = spec
+        fig_id = f"fig-{post_index}-{fig_i}"
+        caption = f"Fig{post_index}.{fig_i} - {alt}"
+        info = images.get(src, {})
+        img_html = original_img_tag or f'<img src="{info.get("url", src)}" alt="{alt}"/>'
+        attrs = {}
+        if info.get("width"):
+            attrs["width"] = info["width"]
+            attrs["height"] = info["height"]
+        # The first figure is likely above the fold; defer the rest
+        if fig_i > 1:
+            attrs["loading"] = "lazy"
+            attrs["decoding"] = "async"
+        img_html = add_img_attrs(img_html, attrs)
+        if info.get("files"):
+            img_html = picture_html(img_html, info["files"])
+        spec[:] = [f'<figure class="post-figure" id="{fig_id}">\n  {img_html}\n  <figcaption>{caption}</figcaption>\n</figure>']
+        mapping[image_name(src)] = (fig_id, caption)
+
+    # Link bare mentions of figure filenames, but only in text nodes
+    names = [name for name in mapping if name]
+    if names:
+        mention_re = re.compile(rf"\b(?:{trie_pattern(names)})\b")
+
+        def mention_repl(m):
+            fid, caption = mapping[m.group(0)]
+            return f'<a href="#{fid}">{caption}</a>'
+
+        parts = HTML_TAG_SPLIT_RE.split(masked)
+        for i in range(0, len(parts), 2):
+            parts[i] = mention_re.sub(mention_repl, parts[i])
+        masked = ''.join(parts)
+
+    final = TOKEN_PLACEHOLDER_RE.sub(expand, masked)
+    return final, mapping
+
+
+def render_post(args):
+    """Converts a single post to a full HTML page and writes it out.
+
+    Takes a (source, post_idx, image_names, image_info, sidebar_html,
+    static) tuple so it can be used with ProcessPoolExecutor.map, and
+    returns the post's read time, search terms (see
+    search_index.post_terms) and image and video references, so nothing
+    later in the build has to read the post again. The post is read here
+    rather than passed in, and the page is rendered once and written
+    through a temporary file, so only one post is held in memory at a
+    time. `image_info` maps stored image names to their dimensions and
+    responsive variants.
+    """
+    source, post_idx, image_names, image_info, sidebar_html, static = args
+
+    with telemetry.span("render_post", source):
+        post = load_post(source)
+        read_time = _render_post(post, post_idx, image_names, image_info, sidebar_html, static)
+        return read_time, search_index.post_terms(post), find_image_refs(post.body), find_video_refs(post.body)
+
+
+def render_post_collect(args):
+    """render_post() for worker processes: also returns the telemetry
+    spans and output counts recorded while rendering, for the parent to
+    merge.
+    """
+    return render_post(args), telemetry.drain(), build_cache.take_output_counts()
+
+
+def merge_worker_results(results):
+    """Passes through render_post_collect() results as they arrive, merging
+    each one's spans and output counts into this process.
+    """
+    for result, events, counts in results:
+        telemetry.merge(events)
+        build_cache.add_output_counts(counts)
+        yield result
+
+
+def _render_post(post, post_idx, image_names, image_info, sidebar_html, static):
+    # Convert obsidian-style images (metadata lines were already stripped when parsing)
+    with telemetry.span("convert_obsidian_images"):
+        body = convert_obsidian_images(post.body, post.path, image_names)
+
+    # Remove leading H1 from content so template title doesn't duplicate it
+    cleaned_no_h1 = remove_leading_h1(body)
+
+    # Keyed by the reference each figure was written with; only the URL
+    # is shared by references to byte-identical images
+    images = {ref: dict(image_info[name], url=f"{ASSETS_URL}/{name}")
+              for ref, name in image_names.items() if name in image_info}
+    with telemetry.span("process_figures"):
+        cleaned_no_h1, figures = process_figures(cleaned_no_h1, post_idx, images)
+
+    # Compute read time from cleaned content (metadata removed)
+    read_time = compute_read_time_from_lines(cleaned_no_h1)
+
+    with telemetry.span("markdown"):
+        html_fragment = add_video_preload(markdown_to_html(cleaned_no_h1))
+
+    context = dict(
+        title=post.title,
+        content=html_fragment,
+        posts=sidebar_html,
+        page_date=post.date,
+        page_author=post.author,
+        page_tags=post.tags,
+        read_time=read_time,
+        challenge=post.challenge,
+        challenge_name=post.challenge_name,
+        static=static
+    )
+    with telemetry.span("template_render"):
+        chunks = render_page(context)
+
+    # The icons and stylesheet rules the page uses go in its head
+    with telemetry.span("critical_css"):
+        page = "".join(chunks)
+        sprite = icons.sprite(icons.used_icons(page))
+        css = critical_css.extract([icons.rewrite(page)])
+        del page
+
+    with telemetry.span("write_page"):
+        chunks = fill_markers(map(icons.rewrite, chunks), {ICON_SPRITE_MARKER: sprite, CRITICAL_CSS_MARKER: css})
+        build_cache.write_stream(os.path.join(HTML_OUTPUT_DIR, post.output_filename), chunks)
+    return read_time
+
+
+def render_page(context):
+    """Renders a post page once, as the list of chunks generate() yields,
+    with markers standing in for its icon sprite and critical CSS: both
+    depend on the whole page, so they are filled in when it is written.
+    """
+    return list(get_template().generate(critical_css=CRITICAL_CSS_MARKER, icon_sprite=ICON_SPRITE_MARKER,
+                                        **context))
+
+
+def fill_markers(chunks, values):
+    """Yields `chunks` with the first occurrence of each marker in
+    `values` replaced by its value. A marker is one template expression,
+    so it never straddles two chunks.
+    """
+    pending = dict(values)
+    for chunk in chunks:
+        for marker in [marker for marker in pending if marker in chunk]:
+            chunk = chunk.replace(marker, pending.pop(marker), 1)
+        yield chunk
+
+
+def sidebar_item(post):
+    return f'<li><a href="{post.output_filename}"><i class="fas fa-file-alt"></i> {post.title}</a></li>'
+
+
+def sidebar_fallback(all_posts, position):
+    """Returns the server-rendered sidebar for the post at `position` in the
+    listing (newest first): the SIDEBAR_FALLBACK_POSTS most recent posts as
+    of that post, i.e. the post itself and the ones published before it.
+
+    Anchoring the list at the page's own post means publishing a newer post
+    leaves older pages untouched.
+    """
+    return "".join(sidebar_item(post) for post in sidebar_posts(all_posts, position))
+
+
+def sidebar_posts(all_posts, position):
+    """Returns the posts in the sidebar of the post at `position`."""
+    return all_posts[position:position + SIDEBAR_FALLBACK_POSTS]
+
+
+def write_sidebar_manifest(all_posts, path=SIDEBAR_MANIFEST):
+    """Writes the full sidebar post list as JSON for blog.js. The version
+    lets the browser skip re-rendering a list it already has.
+    Returns True when the file changed.
+    """
+    entries = [[post.title, post.output_filename] for post in all_posts]
+    version = build_cache.hash_parts(entries)[:12]
+    return build_cache.write_if_changed(path, json.dumps({"version": version, "posts": entries}, separators=(",", ":")))
+
+
+def write_asset_manifest(static, assignments, path=ASSET_MANIFEST):
+    """Writes {source path: published path} for the fingerprinted static
+    files and the stored writeup images. Returns True when the file changed.
+    """
+    published = {os.path.join(assets.STATIC_DIR, src): os.path.join(assets.STATIC_DIR, dest) for src, dest in static.items()}
+    published.update((src_path, os.path.join(ASSETS_DIR, name)) for src_path, (name, _) in assignments.items())
+    return build_cache.write_if_changed(path, json.dumps(published, indent=1, sort_keys=True))
+
+
+def numbering_order(all_posts):
+    """Returns the sources of `all_posts` (in listing order, newest first)
+    in the order posts are numbered by, which their figure ids carry:
+    oldest first, so publishing a new post doesn't renumber the existing
+    ones. Undated posts, listed last, are numbered after the dated ones
+    in name order, so adding one doesn't renumber every dated post.
+    """
+    dated = len(all_posts)
+    while dated and try_parse_date(all_posts[dated - 1].date) == datetime.min:
+        dated -= 1
+    return [post.source for post in reversed(all_posts[:dated])] + [post.source for post in all_posts[dated:]]
+
+
+def post_dependencies(post_idx, source_digest, images, sidebar, shared):
+    """Returns what one post's page depends on, by name (see
+    build_cache.explain_changes): the `shared` inputs of every page (the
+    converter version, template, vendored icons and fingerprinted static
+    assets), the markdown source, its position in the build (figure ids
+    are numbered by it), each image it references with its stored name,
+    digest and variants, and the title and order of the posts in its
+    sidebar fallback.
+    """
+    return dict(
+        shared,
+        source=source_digest,
+        position=post_idx,
+        # Image sizes and variants are recorded by digest, to keep the
+        # manifest small
+        image={ref: [name, digest, build_cache.hash_parts(info)[:16]] for ref, name, digest, info in images},
+        **{"sidebar post": {post.source: [rank, post.title] for rank, post in enumerate(sidebar)}},
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert blog-src writeups into docs/blog HTML pages.")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore the build manifest and rebuild every post")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes used to render posts (0 = one per CPU)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print time, I/O and cache use per stage and the slowest posts")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="number of slowest posts listed by --profile (default: 10)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a Chrome trace-event JSON file of the build")
+    parser.add_argument("--explain", action="store_true",
+                        help="print why each rebuilt page had to be rebuilt")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.profile or args.trace:
+        telemetry.enable()
+
+    with telemetry.span("build"):
+        build(args)
+
+    if args.profile:
+        telemetry.print_summary(args.profile_top)
+    if args.trace:
+        telemetry.write_trace(args.trace)
+
+
+def watched_changes(paths):
+    """Sorts the paths a watcher saw change into the post sources among
+    them and the filenames of the other files under blog-src (images,
+    mostly). Returns None when anything else changed (a template, the
+    icons or a static file), since every page depends on those.
+    """
+    sources, names = set(), set()
+    for path in map(os.path.normpath, paths):
+        if os.path.dirname(path) == SRC_DIR and is_post_file(os.path.basename(path)):
+            sources.add(os.path.basename(path))
+        elif path.startswith(SRC_DIR + os.sep):
+            names.add(os.path.basename(path))
+        else:
+            return None
+    return sources, names
+
+
+def affected_posts(last, sources, names, layout):
+    """Returns the posts a build has to check when only the post `sources`
+    and other files named `names` under blog-src changed since the `last`
+    build in this process: the changed and new posts, the ones referencing
+    an image by a changed filename, and the ones whose position or sidebar
+    moved or lists a changed post. `layout` maps each post to its position
+    and sidebar as of now.
+    """
+    check = {md_file for md_file, place in layout.items()
+             if last["layout"].get(md_file) != place or not sources.isdisjoint(place[1])}
+    if names:
+        check.update(md_file for md_file, (_, image_refs, _) in last["sources"].items()
+                     if md_file in layout and any(os.path.basename(ref) in names for ref in image_refs))
+    return check
+
+
+def save_state(state):
+    """Saves the manifest and commits the catalogue a build left in `state`."""
+    with telemetry.span("save_manifest"):
+        build_cache.save_manifest(state["manifest"])
+        state["catalogue"].commit()
+
+
+def discard_state(state):
+    """Forgets what a failed build left in `state`, so the next one starts
+    again from the last saved manifest and catalogue.
+    """
+    if "catalogue" in state:
+        state["catalogue"].conn.rollback()
+        state["catalogue"].close()
+    state.clear()
+
+
+def remove_deleted_posts(manifest, live_posts):
+    """Removes the pages of posts whose source is gone. Only pages recorded
+    in the manifest are touched, so hand-written pages in the output
+    directory are left alone.
+    """
+    for source, entry in manifest["posts"].items():
+        if source not in live_posts and entry.get("outputs"):
+            page = entry["outputs"][0]
+            build_cache.remove_output(page)
+            print(f"Removed {page} (source {source} is gone)")
+
+
+def build(args, state=None, changed=None):
+    """Runs one build. Without `state`, the manifest and catalogue are
+    loaded and saved again here.
+
+    The watcher keeps them in memory instead: `state` is a dict it holds
+    on to between builds (see save_state and discard_state), and `changed`
+    the paths changed since the last one. When only posts and images
+    changed, only the posts those can affect are checked (see
+    affected_posts), and the others are taken to be unchanged.
+    """
+    # Counts are per build; the watcher runs several in one process
+    build_cache.take_output_counts()
+
+    os.makedirs(HTML_OUTPUT_DIR, exist_ok=True)
+    os.makedirs(ASSETS_DIR, exist_ok=True)
+
+    jobs = args.jobs or os.cpu_count() or 1
+
+    keep = state is not None
+    state = {} if state is None else state
+    if "manifest" not in state:
+        with telemetry.span("load_manifest"):
+            state["manifest"] = build_cache.empty_manifest() if args.force else build_cache.load_manifest()
+        state["catalogue"] = Catalogue(reset=args.force)
+    manifest = state["manifest"]
+    catalogue = state["catalogue"]
+    # Only a build that finished leaves behind what it resolved
+    last = state.pop("last", None)
+    targets = watched_changes(changed) if last and changed is not None else None
+
+    with telemetry.span("get_all_posts"):
+        all_posts = get_all_posts(catalogue, manifest["files"], targets and targets[0])
+    posts_by_source = {post.source: post for post in all_posts}
+
+    # Pages only embed a short sidebar of their own; the full list is one
+    # shared file the browser caches across pages.
+    positions = {post.source: position for position, post in enumerate(all_posts)}
+    with telemetry.span("sidebar_manifest"):
+        if write_sidebar_manifest(all_posts):
+            print(f"Updated sidebar manifest at {SIDEBAR_MANIFEST}")
+
+    with telemetry.span("fingerprint_static"):
+        static = assets.fingerprint_static(manifest["files"])
+
+    template_path = os.path.join(TEMPLATE_DIR, TEMPLATE_NAME)
+    shared = {
+        "converter": CONVERTER_VERSION,
+        "template": {template_path: build_cache.file_digest(template_path, manifest["files"])},
+        "icons": icons.icon_set_digest(manifest["files"]),
+        "static": static,
+    }
+
+    md_files = numbering_order(all_posts)
+    layout = {md_file: (post_idx, tuple(post.source for post in sidebar_posts(all_posts, positions[md_file])))
+              for post_idx, md_file in enumerate(md_files, start=1)}
+    check = affected_posts(last, *targets, layout) if targets else set(md_files)
+
+    # Resolve every post's image references first, so the asset store can
+    # name and deduplicate images across the whole corpus.
+    sources = {}
+    video_refs = {}
+    with telemetry.span("resolve_images"):
+        for md_file in md_files:
+            if md_file not in check:
+                sources[md_file] = last["sources"][md_file]
+                video_refs[md_file] = last["video_refs"][md_file]
+                continue
+            post = posts_by_source[md_file]
+            entry = manifest["posts"].get(md_file)
+
+            # Media references only need re-scanning when the source itself changed
+            source_digest = build_cache.file_digest(post.path, manifest["files"])
+            if entry and entry["deps"]["source"] == source_digest:
+                image_refs = entry["images"]
+                video_refs[md_file] = entry["videos"]
+            else:
+                body = load_post(md_file).body
+                image_refs = find_image_refs(body)
+                video_refs[md_file] = find_video_refs(body)
+
+            resolved = {ref: resolve_image_path(ref, post.path) for ref in image_refs}
+            sources[md_file] = (source_digest, image_refs, resolved)
+
+    with telemetry.span("assign_names"):
+        assignments = assets.assign_names(
+            [path for _, _, resolved in sources.values() for path in resolved.values() if path],
+            manifest["files"])
+    with telemetry.span("sync_assets"):
+        copied = assets.sync_assets(assignments, manifest["files"], ASSETS_DIR)
+    if copied:
+        print(f"Copied {copied} image(s) to {ASSETS_DIR}")
+    with telemetry.span("sync_media"):
+        published = assets.sync_media([ref for refs in video_refs.values() for ref in refs], manifest["files"])
+    if published:
+        print(f"Published {published} video(s) to {assets.VIDEOS_DIR}")
+    with telemetry.span("build_variants"):
+        variants = assets.build_variants(assignments, manifest["variants"], assets.VARIANTS_DIR, jobs)
+    with telemetry.span("image_dimensions"):
+        dimensions = assets.image_dimensions(assignments, manifest["dimensions"])
+    with telemetry.span("asset_manifest"):
+        if write_asset_manifest(static, assignments):
+            print(f"Updated asset manifest at {ASSET_MANIFEST}")
+
+    stored_images = {path: [name, digest, variants.get(name), dimensions.get(name)]
+                     for path, (name, digest) in assignments.items()}
+    if targets:
+        # An image whose name, content or variants changed changes every
+        # page showing it
+        moved = {path for path, image in stored_images.items() if last["images"].get(path) != image}
+        if moved:
+            check.update(md_file for md_file, (_, _, resolved) in sources.items()
+                         if not moved.isdisjoint(resolved.values()))
+
+    pending = []
+    skipped = 0
+
+    with telemetry.span("check_posts"):
+        for post_idx, md_file in enumerate(md_files, start=1):
+            if md_file not in check:
+                skipped += 1
+                telemetry.add("cache_hit")
+                continue
+            post = posts_by_source[md_file]
+            entry = manifest["posts"].get(md_file)
+            source_digest, image_refs, resolved = sources[md_file]
+
+            image_names = {}
+            image_info = {}
+            images = []
+            for ref in image_refs:
+                name, digest = assignments[resolved[ref]] if resolved[ref] else (None, None)
+                if name:
+                    image_names[ref] = name
+                    width, height = dimensions.get(name, (None, None))
+                    files = variants[name]["files"] if name in variants else None
+                    image_info[name] = {"width": width, "height": height, "files": files}
+                images.append([ref, name, digest, image_info.get(name)])
+
+            deps = post_dependencies(post_idx, source_digest, images,
+                                     sidebar_posts(all_posts, positions[md_file]), shared)
+            reasons = build_cache.explain_changes(entry and entry.get("deps"), deps,
+                                                  entry["outputs"] if entry else ())
+            if not reasons and not post.read_time:
+                # Listed without a read time (say, after the catalogue was
+                # rebuilt), so it is rendered again to get one
+                reasons = ["no read time listed"]
+            if not reasons:
+                skipped += 1
+                telemetry.add("cache_hit")
+                continue
+            telemetry.add("cache_miss")
+
+            # Only what's needed to render the post is kept; its source is
+            # read by whichever process renders it
+            sidebar_html = sidebar_fallback(all_posts, positions[md_file])
+            pending.append((post, post_idx, deps, reasons, image_names, image_info, sidebar_html))
+
+    # Rendering is independent per post, so it can be fanned out over a
+    # process pool. Each page is written by the process that renders it and
+    # only what the rest of the build needs from the post comes back, in
+    # submission order either way; the results are consumed as they arrive
+    # rather than collected.
+    render_args = (
+        (post.source, post_idx, image_names, image_info, sidebar_html, static)
+        for post, post_idx, _, _, image_names, image_info, sidebar_html in pending
+    )
+    rendered_terms = {}
+    with contextlib.ExitStack() as stack:
+        if jobs > 1 and len(pending) > 1:
+            workers = min(jobs, len(pending))
+            chunksize = max(1, len(pending) // (workers * 4))
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers, initializer=telemetry.init_worker,
+                                                           initargs=(telemetry.enabled(),)))
+            results = merge_worker_results(pool.map(render_post_collect, render_args, chunksize=chunksize))
+        else:
+            results = map(render_post, render_args)
+
+        for (post, _, deps, reasons, image_names, _, _), (read_time, terms, image_refs, videos) in zip(pending, results):
+            output_path = os.path.join(HTML_OUTPUT_DIR, post.output_filename)
+            print(f"Converted {post.source} -> {output_path}")
+            if args.explain:
+                print(f"    because: {'; '.join(reasons)}")
+
+            # The index shows the read time of the rendered page
+            post.read_time = read_time
+            catalogue.set_read_time(post.source, read_time)
+            rendered_terms[post.source] = terms
+
+            copied_images = [os.path.join(ASSETS_DIR, name) for name in image_names.values()]
+            copied_images += [
+                os.path.join(assets.VARIANTS_DIR, filename)
+                for name in set(image_names.values()) if name in variants
+                for _, filename in variants[name]["files"]
+            ]
+            manifest["posts"][post.source] = {
+                "deps": deps,
+                "images": image_refs,
+                "videos": videos,
+                "outputs": [output_path] + copied_images,
+            }
+
+    if skipped:
+        print(f"Skipped {skipped} unchanged post(s)")
+        build_cache.add_output_counts({"unchanged": skipped})
+
+    if all_posts:
+        with telemetry.span("update_blog_index"):
+            update_blog_index(catalogue, static, manifest, args.explain)
+        with telemetry.span("build_search_index"):
+            written = search_index.build_search_index(all_posts, manifest["search"], manifest["files"],
+                                                      sources=targets and targets[0], terms=rendered_terms)
+        if written:
+            print(f"Updated {written} search index file(s) in {search_index.SEARCH_DIR}")
+
+    remove_deleted_posts(manifest, set(md_files))
+    build_cache.prune(manifest, set(md_files))
+    state["last"] = {"sources": sources, "video_refs": video_refs, "layout": layout, "images": stored_images}
+    if not keep:
+        save_state(state)
+        catalogue.close()
+
+    counts = build_cache.take_output_counts()
+    print(f"Outputs: {counts['updated']} updated, {counts['unchanged']} unchanged, {counts['deleted']} deleted")
 
 
 if __name__ == "__main__":
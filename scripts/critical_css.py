@@ -0,0 +1,212 @@
+import os
+import re
+
+# --- CONFIGURATION ---
+STYLESHEET = "docs/blog/css/blog.css"
+
+# Classes blog.js adds while the page loads. They count as present on every
+# page, so content they reveal isn't left unstyled until the full
+# stylesheet arrives. Classes only added on interaction are left out.
+DYNAMIC_CLASSES = ("active", "visible", "code-wrapper", "copy-btn")
+
+TAG_RE = re.compile(r"<([a-zA-Z][\w-]*)")
+ATTR_RE = re.compile(r"""\s(class|id)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+))""", re.I)
+COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+# Parts of a selector that can't rule it out: attribute selectors (the
+# theme is switched through one at runtime), and pseudo-classes and
+# pseudo-elements, arguments included
+IGNORED_SELECTOR_PARTS_RE = re.compile(r"\[[^\]]*\]|::?[\w-]+(?:\([^()]*\))?")
+COMBINATOR_RE = re.compile(r"[\s>+~]+")
+SIMPLE_SELECTOR_RE = re.compile(r"([.#]?)(-?[_a-zA-Z][\w-]*)")
+
+# Parsed stylesheets by (path, mtime_ns, size), each with the critical CSS
+# selected so far for every set of relevant page features
+_stylesheets = {}
+
+
+def page_tokens(chunks):
+    """Returns the tag names ("tag:div"), classes (".card") and ids
+    ("#main") used by a page given as an iterable of HTML chunks.
+
+    Tags are found with a pattern rather than a full parser; anything it
+    picks up by mistake (say, markup inside a script) only keeps more rules.
+    """
+    html = "".join(chunks)
+    tokens = {f".{name}" for name in DYNAMIC_CLASSES}
+    tokens.update(f"tag:{tag.lower()}" for tag in set(TAG_RE.findall(html)))
+    for attr, double, single, bare in ATTR_RE.findall(html):
+        value = double or single or bare
+        if attr.lower() == "class":
+            tokens.update(f".{cls}" for cls in value.split())
+        elif value:
+            tokens.add(f"#{value}")
+    return frozenset(tokens)
+
+
+def selector_requirements(selector):
+    """Returns the page features a selector needs to match anything.
+
+    This over-approximates: every compound is checked on its own, so a
+    selector is kept whenever its tags, classes and ids all occur
+    somewhere in the page, whatever their nesting.
+    """
+    selector = IGNORED_SELECTOR_PARTS_RE.sub("", selector)
+    required = set()
+    for compound in COMBINATOR_RE.split(selector):
+        for prefix, name in SIMPLE_SELECTOR_RE.findall(compound):
+            required.add(f"tag:{name.lower()}" if not prefix else prefix + name)
+    return frozenset(required)
+
+
+def _closing_brace(css, start):
+    """Returns the index of the brace closing the one at `start`, skipping
+    strings.
+    """
+    depth = 0
+    i = start
+    while i < len(css):
+        c = css[i]
+        if c in "\"'":
+            i = css.find(c, i + 1)
+            if i < 0:
+                return len(css)
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if not depth:
+                return i
+        i += 1
+    return len(css)
+
+
+def _split_selectors(prelude):
+    selectors = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(prelude):
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif c == "," and not depth:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return [s for s in selectors if s]
+
+
+def parse_rules(css):
+    """Parses a stylesheet into a list of rules, in order:
+    ("style", [(selector, requirements)], body), ("group", prelude, rules)
+    for @media and @supports blocks, and ("at", prelude, body) for other
+    at-rules such as @keyframes and @font-face.
+    """
+    rules = []
+    pos = 0
+    while True:
+        brace = css.find("{", pos)
+        if brace < 0:
+            return rules
+        end = _closing_brace(css, brace)
+        # Statements such as @import end in ";" and have no block
+        prelude = css[pos:brace].rsplit(";", 1)[-1].strip()
+        body = css[brace + 1:end]
+        if prelude.startswith(("@media", "@supports")):
+            rules.append(("group", prelude, parse_rules(body)))
+        elif prelude.startswith("@"):
+            rules.append(("at", prelude, body))
+        else:
+            selectors = [(s, selector_requirements(s)) for s in _split_selectors(prelude)]
+            rules.append(("style", selectors, body))
+        pos = end + 1
+
+
+def load_stylesheet(path):
+    """Returns (rules, used tokens, selection cache) for a stylesheet,
+    reparsing it only when the file changes.
+    """
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _stylesheets:
+        with open(path, "r", encoding="utf-8") as f:
+            rules = parse_rules(COMMENT_RE.sub("", f.read()))
+        used = set()
+        for rule in _walk(rules):
+            if rule[0] == "style":
+                used.update(token for _, requirements in rule[1] for token in requirements)
+        _stylesheets[key] = (rules, frozenset(used), {})
+    return _stylesheets[key]
+
+
+def _walk(rules):
+    for rule in rules:
+        yield rule
+        if rule[0] == "group":
+            yield from _walk(rule[2])
+
+
+def _squeeze(text):
+    return re.sub(r"\s*([{};])\s*", r"\1", re.sub(r"\s+", " ", text)).strip().rstrip(";")
+
+
+def _select(rules, tokens):
+    """Returns the CSS of the rules that may match a page with `tokens`,
+    with at-rules other than groups left as (prelude, body) to be decided
+    once all style rules are known.
+    """
+    out = []
+    for kind, head, body in rules:
+        if kind == "style":
+            selectors = [selector for selector, requirements in head if requirements <= tokens]
+            if selectors:
+                out.append(",".join(selectors) + "{" + _squeeze(body) + "}")
+        elif kind == "group":
+            inner = _select(body, tokens)
+            if inner:
+                out.append((head, inner))
+        else:
+            out.append((head, body))
+    return out
+
+
+def _serialize(selected, kept_text):
+    parts = []
+    for item in selected:
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        head, body = item
+        if isinstance(body, list):
+            parts.append(head + "{" + _serialize(body, kept_text) + "}")
+        elif head.startswith("@keyframes"):
+            # Keep an animation only if a kept rule runs it
+            name = head.split(None, 1)[1].strip() if " " in head else ""
+            if name and re.search(rf"(?<![\w-]){re.escape(name)}(?![\w-])", kept_text):
+                parts.append(head + "{" + _squeeze(body) + "}")
+        else:
+            parts.append(head + "{" + _squeeze(body) + "}")
+    return "".join(parts)
+
+
+def _flatten(selected):
+    for item in selected:
+        if isinstance(item, str):
+            yield item
+        elif isinstance(item[1], list):
+            yield from _flatten(item[1])
+
+
+def extract(chunks, stylesheet_path=STYLESHEET):
+    """Returns the rules of the stylesheet at `stylesheet_path` that may
+    apply to a page given as an iterable of HTML chunks.
+
+    Only the page features the stylesheet mentions decide the result, so
+    pages with the same structure share one cached selection.
+    """
+    rules, used, selections = load_stylesheet(stylesheet_path)
+    tokens = page_tokens(chunks) & used
+    if tokens not in selections:
+        selected = _select(rules, tokens)
+        selections[tokens] = _serialize(selected, "".join(_flatten(selected)))
+    return selections[tokens]
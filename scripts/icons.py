@@ -0,0 +1,86 @@
+import os
+import re
+
+import build_cache
+
+# --- CONFIGURATION ---
+# Vendored Font Awesome Free solid icons, one SVG per icon (see LICENSE.txt
+# there). Add a file from the fontawesomefree package to use a new icon.
+ICON_DIR = "scripts/icons/solid"
+
+# Font Awesome 5 names still used by the templates, mapped to the Font
+# Awesome 6 file names the icons are vendored under
+ALIASES = {
+    "calendar-alt": "calendar-days",
+    "exclamation-circle": "circle-exclamation",
+    "file-alt": "file-lines",
+    "home": "house",
+    "pen-alt": "pen-clip",
+    "project-diagram": "diagram-project",
+    "search": "magnifying-glass",
+}
+
+# Icons blog.js creates while the page runs. They go into every page's
+# sprite, as the HTML doesn't mention them.
+DYNAMIC_ICONS = ("file-alt", "copy", "check", "exclamation-circle")
+
+# An empty icon element, <i class="fas fa-clock"></i>. Template
+# expressions must not appear inside the tag, so that when a page is
+# streamed every icon arrives within one chunk.
+ICON_TAG_RE = re.compile(r"""<i\s+class="([^"]*?\bfa-([a-z0-9-]+)[^"]*)"([^>]*)>\s*</i>""")
+SVG_RE = re.compile(r"<svg\b[^>]*\bviewBox=\"([^\"]*)\"[^>]*>(.*)</svg>", re.S)
+SVG_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+
+# Symbols loaded so far by icon name; None for icons that aren't vendored
+_symbols = {}
+
+
+def used_icons(html):
+    """Returns the names of the icons a page shows, including the ones
+    blog.js adds.
+    """
+    return set(DYNAMIC_ICONS) | {m.group(2) for m in ICON_TAG_RE.finditer(html)}
+
+
+def rewrite(html):
+    """Fills every icon element with a reference to its symbol in the
+    page's sprite, keeping the element and its classes for styling.
+    """
+    return ICON_TAG_RE.sub(
+        r'<i class="\1"\3><svg aria-hidden="true"><use href="#fa-\2"></use></svg></i>', html)
+
+
+def symbol(name):
+    """Returns the <symbol> for an icon, or None (with a warning, once)
+    when no icon of that name is vendored.
+    """
+    if name not in _symbols:
+        path = os.path.join(ICON_DIR, ALIASES.get(name, name) + ".svg")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                m = SVG_RE.search(f.read())
+        except FileNotFoundError:
+            m = None
+        if m:
+            body = SVG_COMMENT_RE.sub("", m.group(2)).strip()
+            _symbols[name] = f'<symbol id="fa-{name}" viewBox="{m.group(1)}">{body}</symbol>'
+        else:
+            print(f"Warning: no icon for fa-{name} in {ICON_DIR}")
+            _symbols[name] = None
+    return _symbols[name]
+
+
+def sprite(names):
+    """Returns an inline SVG sprite holding the symbols of `names`."""
+    symbols = [symbol(name) for name in sorted(names)]
+    return ('<svg xmlns="http://www.w3.org/2000/svg" style="display: none;">'
+            + "".join(s for s in symbols if s) + "</svg>")
+
+
+def icon_set_digest(file_cache):
+    """Returns a digest of the vendored icons, so pages are rebuilt when
+    one of them changes.
+    """
+    names = sorted(name for name in os.listdir(ICON_DIR) if name.endswith(".svg"))
+    return build_cache.hash_parts([(name, build_cache.file_digest(os.path.join(ICON_DIR, name), file_cache))
+                                   for name in names])
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Writes a deployable copy of docs/ with minified and precompressed files.
+
+Run from the repository root after the converter:
+
+    python scripts/optimize_site.py [--output site] [--jobs 0] [--no-precompress]
+
+HTML, CSS and JavaScript are minified conservatively: whitespace-sensitive
+elements (<pre>, <code>, <textarea>) and inline scripts and styles are
+kept as they are, and line breaks are kept in JavaScript so automatic
+semicolon insertion is never affected. Text files also get .gz and .br
+siblings for servers that can serve them directly (.br needs the optional
+brotli package). Every other file is copied unchanged.
+
+docs/ itself is left alone, as it holds hand-written pages and the
+committed build output. Results are cached in the build manifest by source
+digest, so only files that changed are processed again.
+"""
+import argparse
+import gzip
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import assets
+import build_cache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; only .gz siblings are written then
+    brotli = None
+
+# --- CONFIGURATION ---
+SOURCE_DIR = "docs"
+OUTPUT_DIR = "site"
+
+# Bump whenever minifying or compressing changes, so cached outputs are redone
+OPTIMIZER_VERSION = "1"
+
+PRECOMPRESSED_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".xml", ".txt"}
+# Compressing tiny files saves nothing once headers are counted
+PRECOMPRESS_MIN_BYTES = 512
+
+HTML_TOKEN_RE = re.compile(
+    r"""
+      (?P<comment><!--.*?-->)
+    | (?P<raw><(?P<raw_tag>pre|code|textarea|script|style)\b.*?</(?P=raw_tag)\s*>)
+    | (?P<tag><[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>)
+    """,
+    re.S | re.I | re.X,
+)
+# Conditional comments are markup for old browsers, not comments
+KEPT_COMMENT_RE = re.compile(r"<!--\[if|<!--<!|<!--\s*\[endif")
+NEWLINE_RUN_RE = re.compile(r"\s*\n\s*")
+SPACE_RUN_RE = re.compile(r"[ \t\r\f\v]+")
+
+CSS_TOKEN_RE = re.compile(r"""(?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(?P<comment>/\*.*?\*/)""", re.S)
+CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+
+# A "/" after one of these starts a regular expression literal, not a division
+JS_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+JS_REGEX_KEYWORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new",
+                     "delete", "void", "throw", "instanceof", "yield", "await"}
+JS_WORD_RE = re.compile(r"[A-Za-z_$][\w$]*$")
+
+
+def collapse_whitespace(text):
+    """Collapses whitespace runs in text to one space or one line break,
+    which browsers render the same way.
+    """
+    return SPACE_RUN_RE.sub(" ", NEWLINE_RUN_RE.sub("\n", text))
+
+
+def _minify_between(text, token_re, keep, squeeze):
+    """Applies `squeeze` to the text between the tokens matched by
+    `token_re`. Tokens for which `keep(match)` is true are copied verbatim;
+    the others are dropped, joining the text around them.
+    """
+    out = []
+    run = []
+    pos = 0
+    for m in token_re.finditer(text):
+        run.append(text[pos:m.start()])
+        pos = m.end()
+        if keep(m):
+            out.append(squeeze("".join(run)))
+            out.append(m.group(0))
+            run = []
+        else:
+            run.append(" ")
+    run.append(text[pos:])
+    out.append(squeeze("".join(run)))
+    return "".join(out)
+
+
+def minify_html(text):
+    """Drops comments and collapses whitespace between and around tags.
+    Tags themselves and raw elements are copied verbatim.
+    """
+    def keep(m):
+        return m.group("comment") is None or KEPT_COMMENT_RE.match(m.group(0))
+
+    return _minify_between(text, HTML_TOKEN_RE, keep, collapse_whitespace).strip() + "\n"
+
+
+def minify_css(text):
+    """Drops comments (except /*! notices) and whitespace that CSS doesn't
+    need. Strings are copied verbatim.
+    """
+    def keep(m):
+        return m.group("string") is not None or m.group(0).startswith("/*!")
+
+    def squeeze(code):
+        return CSS_PUNCTUATION_RE.sub(r"\1", re.sub(r"\s+", " ", code))
+
+    css = _minify_between(text, CSS_TOKEN_RE, keep, squeeze)
+    return CSS_PUNCTUATION_RE.sub(r"\1", css).replace(";}", "}").strip() + "\n"
+
+
+def _starts_regex(tail):
+    """True when a "/" following the code `tail` opens a regular expression."""
+    tail = tail.rstrip()
+    if not tail or tail[-1] in JS_REGEX_AFTER:
+        return True
+    word = JS_WORD_RE.search(tail)
+    return bool(word) and word.group(0) in JS_REGEX_KEYWORDS
+
+
+def _js_tokens(text):
+    """Splits JavaScript into ("code", text) and ("literal", text) pieces,
+    dropping comments. A comment spanning lines becomes a line break.
+    """
+    code = []
+    # The last significant characters seen, to tell regular expressions
+    # from divisions; a literal counts as an operand
+    tail = ""
+    i = 0
+    n = len(text)
+
+    def literal(end):
+        nonlocal code, tail
+        pieces = [("code", "".join(code))] if code else []
+        code = []
+        tail = "0"
+        return pieces + [("literal", text[i:end])]
+
+    while i < n:
+        c = text[i]
+        if c in "\"'`":
+            j = i + 1
+            while j < n and text[j] != c:
+                j += 2 if text[j] == "\\" else 1
+            yield from literal(j + 1)
+            i = j + 1
+        elif text.startswith("//", i):
+            j = text.find("\n", i)
+            i = n if j < 0 else j
+        elif text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            code.append("\n" if "\n" in text[i:j] else " ")
+            i = j
+        elif c == "/" and _starts_regex(tail):
+            j = i + 1
+            in_class = False
+            while j < n and text[j] != "\n" and (in_class or text[j] != "/"):
+                if text[j] == "\\":
+                    j += 1
+                elif text[j] == "[":
+                    in_class = True
+                elif text[j] == "]":
+                    in_class = False
+                j += 1
+            j += 1
+            while j < n and text[j].isalnum():
+                j += 1  # flags
+            yield from literal(j)
+            i = j
+        else:
+            code.append(c)
+            if not c.isspace():
+                tail = (tail + c)[-16:]
+            elif tail and not tail[-1].isspace():
+                tail += " "
+            i += 1
+    if code:
+        yield "code", "".join(code)
+
+
+def minify_js(text):
+    """Drops comments, indentation and blank lines. Line breaks are kept so
+    statements that rely on automatic semicolon insertion still parse the
+    same way; strings, template literals and regular expressions are
+    copied verbatim.
+    """
+    out = []
+    for kind, piece in _js_tokens(text):
+        out.append(piece if kind == "literal" else collapse_whitespace(piece))
+    js = "".join(out)
+    # Whitespace is only ever collapsed, never removed, so joining the
+    # pieces can't glue two tokens together
+    return js.strip() + "\n"
+
+
+MINIFIERS = {".html": minify_html, ".css": minify_css, ".js": minify_js}
+
+
+def optimize_file(args):
+    """Writes the optimized copy of one file, plus its compressed siblings.
+
+    Takes a (src_path, dest_path, precompress) tuple so it can be used with
+    ProcessPoolExecutor.map, and returns (outputs, source bytes, output
+    bytes, output counts).
+    """
+    src_path, dest_path, precompress = args
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+    with open(src_path, "rb") as f:
+        data = f.read()
+    ext = os.path.splitext(src_path)[1].lower()
+    minify = MINIFIERS.get(ext)
+    if minify and not src_path.endswith((".min.js", ".min.css")) and not is_static_source(src_path):
+        data = minify(data.decode("utf-8")).encode("utf-8")
+    build_cache.write_if_changed(dest_path, data)
+
+    outputs = [dest_path]
+    if precompress and ext in PRECOMPRESSED_EXTENSIONS and len(data) >= PRECOMPRESS_MIN_BYTES:
+        # mtime=0 keeps the .gz byte-identical across builds
+        build_cache.write_if_changed(dest_path + ".gz", gzip.compress(data, 9, mtime=0))
+        outputs.append(dest_path + ".gz")
+        if brotli is not None:
+            build_cache.write_if_changed(dest_path + ".br", brotli.compress(data, quality=11))
+            outputs.append(dest_path + ".br")
+
+    return outputs, os.path.getsize(src_path), len(data), build_cache.take_output_counts()
+
+
+def is_static_source(path):
+    """True for the hand-edited originals of fingerprinted assets; pages
+    link to the fingerprinted copies, which are minified instead.
+    """
+    return any(path == os.path.join(assets.STATIC_DIR, static) for static in assets.STATIC_FILES)
+
+
+def is_up_to_date(entry, source_digest, precompress):
+    if not entry or entry["source"] != source_digest:
+        return False
+    if entry["version"] != OPTIMIZER_VERSION or entry["precompress"] != precompress:
+        return False
+    return all(os.path.exists(path) for path in entry["outputs"])
+
+
+def optimize_site(manifest, source_dir=SOURCE_DIR, output_dir=OUTPUT_DIR, precompress=True, jobs=1):
+    """Mirrors `source_dir` into `output_dir`, optimizing files on the way.
+    Files whose source is unchanged since the last run are skipped, and
+    outputs without a source are removed.
+    """
+    cache = manifest["optimized"]
+    if precompress and brotli is None:
+        print("Warning: brotli is not installed; writing .gz files only")
+
+    todo = []
+    live = {}
+    for root, _, files in os.walk(source_dir):
+        for name in sorted(files):
+            src_path = os.path.join(root, name)
+            dest_path = os.path.join(output_dir, os.path.relpath(src_path, source_dir))
+            source_digest = build_cache.file_digest(src_path, manifest["files"])
+            entry = cache.get(src_path)
+            live[src_path] = source_digest
+            if not is_up_to_date(entry, source_digest, precompress):
+                todo.append((src_path, dest_path, precompress))
+
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+            results = list(pool.map(optimize_file, todo, chunksize=max(1, len(todo) // (jobs * 4))))
+    else:
+        results = [optimize_file(item) for item in todo]
+
+    saved = 0
+    for (src_path, _, _), (outputs, source_size, size, counts) in zip(todo, results):
+        build_cache.add_output_counts(counts)
+        cache[src_path] = {"source": live[src_path], "version": OPTIMIZER_VERSION,
+                           "precompress": precompress, "outputs": outputs}
+        saved += source_size - size
+    if todo:
+        print(f"Optimized {len(todo)} file(s) into {output_dir}, minifying away {saved / 1024:.1f} KB")
+
+    for src_path in list(cache):
+        if src_path not in live:
+            del cache[src_path]
+
+    produced = {path for entry in cache.values() for path in entry["outputs"]}
+    for root, _, files in os.walk(output_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if path not in produced:
+                build_cache.remove_output(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write a minified, precompressed copy of docs/ for deployment.")
+    parser.add_argument("--source", default=SOURCE_DIR, help="directory to optimize (default: %(default)s)")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="where to write the optimized copy (default: %(default)s)")
+    parser.add_argument("--no-precompress", action="store_true", help="skip writing .gz and .br siblings")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes (0 = one per CPU)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    build_cache.take_output_counts()
+
+    manifest = build_cache.load_manifest()
+    optimize_site(manifest, args.source, args.output, not args.no_precompress, args.jobs or os.cpu_count() or 1)
+    build_cache.save_manifest(manifest)
+
+    counts = build_cache.take_output_counts()
+    print(f"Outputs: {counts['updated']} updated, {counts['unchanged']} unchanged, {counts['deleted']} deleted")
+
+
+if __name__ == "__main__":
+    main()
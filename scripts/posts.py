@@ -0,0 +1,301 @@
+import os
+import re
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+
+import telemetry
+
+# --- CONFIGURATION ---
+SRC_DIR = "blog-src"
+
+# Listing a post reads at most this much of its source. The header block
+# (and the challenge metadata after it) must fit, or the whole file is read.
+HEADER_MAX_BYTES = 8192
+
+META_KEYS = ("title", "date", "author", "tags", "read_time")
+META_RE = re.compile(rf'^({"|".join(META_KEYS)})\s*:\s*(.*)$', re.IGNORECASE)
+CHALLENGE_RE = re.compile(r"^\s*-\s*\*\*(.+?)\*\*\s*:\s*(.+)$", re.MULTILINE)
+H1_RE = re.compile(r"^#\s+(.*)")
+
+# Header and challenge metadata blocks are made of these lines
+FRONT_MATTER_DELIMITER = "---"
+FRONT_MATTER_RE = re.compile(r"^([A-Za-z_][\w-]*)\s*:\s*(.*)$")
+FRONT_MATTER_ITEM_RE = re.compile(r"^\s*-\s+(.*)$")
+THEMATIC_BREAK_RE = re.compile(r"^\s*(?:-{3,}|\*{3,}|_{3,})\s*$")
+CHALLENGE_HEADING_RE = re.compile(r"^#+\s*challenge metadata\s*$", re.IGNORECASE)
+BULLET_RE = re.compile(r"^\s*[-*+]\s")
+
+
+@dataclass(slots=True)
+class Post:
+    """A single parsed writeup.
+
+    `body` is the markdown with metadata lines removed; it is None for
+    listing records (see get_all_posts), which only carry what the index
+    pages need.
+    """
+    source: str
+    title: str
+    date: str = ""
+    author: str = ""
+    tags: list = field(default_factory=list)
+    read_time: str = ""
+    difficulty: str = ""
+    meta: dict = field(default_factory=dict)
+    challenge: dict = field(default_factory=dict)
+    body: str = None
+
+    @property
+    def path(self):
+        return os.path.join(SRC_DIR, self.source)
+
+    @property
+    def output_filename(self):
+        return os.path.splitext(self.source)[0] + ".html"
+
+    @property
+    def url(self):
+        return f"html/{self.output_filename}"
+
+    @property
+    def challenge_name(self):
+        return self.challenge.get('room_name') or self.challenge.get('room') or ''
+
+    def to_dict(self):
+        """Returns the record without its body, for caching in the manifest."""
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "body"}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def _meta_value(key, value):
+    """Normalizes one metadata value; tags become a list."""
+    value = value.strip().strip('"')
+    if key != 'tags':
+        return value
+    # remove surrounding brackets if present
+    if value.startswith('[') and value.endswith(']'):
+        value = value[1:-1]
+    return [t.strip().strip('"') for t in re.split(r',\s*', value) if t.strip()]
+
+
+def _front_matter_end(lines):
+    """Returns the index of the line closing the YAML-style front matter
+    the lines start with, or None when there is none.
+    """
+    if not lines or lines[0].strip() != FRONT_MATTER_DELIMITER:
+        return None
+    for i in range(1, len(lines)):
+        if lines[i].strip() == FRONT_MATTER_DELIMITER:
+            return i
+    return None
+
+
+def scan_header(lines):
+    """Parses the header block a post starts with: optional YAML-style
+    front matter, then blank lines, the H1 title, the blockquoted
+    description and `Key: value` metadata lines. Scanning stops at the
+    first line that is none of those, so body lines are never mistaken
+    for metadata.
+
+    Returns (meta, title, end, dropped): `end` is the index of the first
+    body line (len(lines) if the header runs to the end) and `dropped` the
+    indices of the lines to remove from the body.
+    """
+    meta = {}
+    title = None
+    dropped = []
+    start = 0
+
+    closing = _front_matter_end(lines)
+    if closing is not None:
+        # Simple `key: value` pairs, with lists either inline or as "- item" lines
+        key = None
+        for line in lines[1:closing]:
+            item = FRONT_MATTER_ITEM_RE.match(line)
+            m = FRONT_MATTER_RE.match(line)
+            if item and key == 'tags':
+                meta.setdefault('tags', []).extend(_meta_value('tags', item.group(1)))
+            elif m:
+                key = m.group(1).lower()
+                if key in META_KEYS:
+                    meta[key] = _meta_value(key, m.group(2))
+        dropped.extend(range(closing + 1))
+        start = closing + 1
+
+    for i in range(start, len(lines)):
+        stripped = lines[i].strip()
+        m = META_RE.match(stripped)
+        if m:
+            key = m.group(1).lower()
+            meta[key] = _meta_value(key, m.group(2))
+            dropped.append(i)
+        elif H1_RE.match(stripped) and title is None:
+            title = H1_RE.match(stripped).group(1)
+        elif stripped and not stripped.startswith(">"):
+            return meta, title, i, dropped
+    return meta, title, len(lines), dropped
+
+
+def scan_challenge_metadata(lines, start):
+    """Parses the challenge metadata bullets ('- **Key:** Value') in the
+    block right after the header: the bullet list, optionally under a
+    "Challenge Metadata" heading and between horizontal rules.
+
+    Returns (challenge, end), `end` being the index of the first line past
+    the block.
+    """
+    challenge = {}
+    for i in range(start, len(lines)):
+        line = lines[i]
+        if BULLET_RE.match(line):
+            m = CHALLENGE_RE.match(line)
+            if m:
+                challenge[m.group(1).strip().lower().replace(' ', '_')] = m.group(2).strip()
+        elif line.strip() and not THEMATIC_BREAK_RE.match(line) and not CHALLENGE_HEADING_RE.match(line.strip()):
+            return challenge, i
+    return challenge, len(lines)
+
+
+def compute_read_time_from_lines(markdown_content, lines_per_min=20):
+    """Simple read time estimate based on number of lines in the markdown.
+    Defaults to 20 lines per minute; always returns at least 1 minute.
+    """
+    if not markdown_content:
+        return "1 min read"
+    num_lines = markdown_content.count('\n') + 1
+    minutes = max(1, round(num_lines / float(lines_per_min)))
+    return f"{minutes} min read"
+
+
+def slugify(value):
+    """Turns a tag or difficulty into a file-name-safe slug."""
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-") or "untitled"
+
+
+def try_parse_date(d):
+    """Parses the free-form Date metadata, returning datetime.min when it
+    cannot be understood so undated posts sort last.
+    """
+    if not d:
+        return datetime.min
+    fmts = ["%B %d, %Y", "%Y-%m-%d", "%d %B %Y", "%b %d, %Y"]
+    for f in fmts:
+        try:
+            return datetime.strptime(d, f)
+        except Exception:
+            continue
+    m = re.search(r"(19|20)\d{2}", d)
+    if m:
+        try:
+            return datetime(int(m.group(0)), 1, 1)
+        except Exception:
+            return datetime.min
+    return datetime.min
+
+
+def is_post_file(filename):
+    """Tells whether a file in blog-src is a post rather than a helper or
+    template file (including hidden template files).
+    """
+    return filename.endswith(".md") and 'template' not in filename.lower() and not filename.startswith('.')
+
+
+def list_post_files():
+    """Returns the markdown post filenames in blog-src in name order (see
+    is_post_file).
+    """
+    return sorted(f for f in os.listdir(SRC_DIR) if is_post_file(f))
+
+
+def _make_post(md_file, meta, title, challenge, **fields):
+    return Post(
+        source=md_file,
+        title=meta.get('title') or title or "Blog Post",
+        date=meta.get('date',''),
+        author=meta.get('author',''),
+        tags=meta.get('tags',[]),
+        difficulty=challenge.get('difficulty',''),
+        meta=meta,
+        challenge=challenge,
+        **fields,
+    )
+
+
+def load_post(md_file):
+    """Reads and parses one markdown post into a Post record."""
+    with telemetry.span("read_post", md_file):
+        with open(os.path.join(SRC_DIR, md_file), "r", encoding="utf-8") as f:
+            content = f.read()
+        telemetry.add("bytes_read", len(content.encode("utf-8")))
+
+    lines = content.splitlines()
+    meta, title, end, dropped = scan_header(lines)
+    challenge, _ = scan_challenge_metadata(lines, end)
+    dropped = set(dropped)
+    cleaned = "\n".join(line for i, line in enumerate(lines) if i not in dropped)
+
+    return _make_post(md_file, meta, title, challenge,
+                      read_time=compute_read_time_from_lines(cleaned), body=cleaned)
+
+
+def read_header(md_file, max_bytes=HEADER_MAX_BYTES):
+    """Returns the lines at the start of a post, reading at most
+    `max_bytes`, and whether they are the whole file. A line cut off by
+    the limit is left out.
+    """
+    with telemetry.span("read_header", md_file):
+        with open(os.path.join(SRC_DIR, md_file), "rb") as f:
+            data = f.read(max_bytes + 1)
+        complete = len(data) <= max_bytes
+        if not complete:
+            data = data[:data.rfind(b"\n", 0, max_bytes) + 1]
+        telemetry.add("bytes_read", len(data))
+    return data.decode("utf-8").splitlines(), complete
+
+
+def load_listing(md_file):
+    """Returns the listing record of a post (see get_all_posts), parsed
+    from the header at the top of its source without reading the body.
+
+    The read time depends on the whole body, so it is left empty; the
+    converter fills it in from the rendered page. Posts whose header
+    doesn't fit in HEADER_MAX_BYTES are read in full.
+    """
+    lines, complete = read_header(md_file)
+    meta, title, end, _ = scan_header(lines)
+    challenge, end = scan_challenge_metadata(lines, end)
+    if end == len(lines) and not complete:
+        post = load_post(md_file)
+        post.body = None
+        return post
+    return _make_post(md_file, meta, title, challenge)
+
+
+def sort_posts(posts):
+    """Sorts posts newest first, falling back to title order."""
+    try:
+        posts.sort(key=lambda p: try_parse_date(p.date), reverse=True)
+    except Exception:
+        posts.sort(key=lambda p: (p.title or ''))
+    return posts
+
+
+def get_all_posts(catalogue=None, file_cache=None, sources=None):
+    """Returns all blog posts as Post records, newest first.
+
+    When a post catalogue is given (see catalogue.Catalogue), it is synced
+    with the source directory and queried, so only posts changed since the
+    last build are re-read; `file_cache` is the manifest's file digest
+    cache, and `sources`, when given, the only posts that may have changed
+    (see Catalogue.sync). Otherwise every post is read and sorted here.
+    The records are listing records without their body (see load_listing),
+    so a large archive is listed from the headers of its posts alone; use
+    load_post() to read one in full.
+    """
+    if catalogue is not None:
+        catalogue.sync({} if file_cache is None else file_cache, sources)
+        return catalogue.posts()
+    return sort_posts([load_listing(md_file) for md_file in list_post_files()])
@@ -0,0 +1,263 @@
+import bisect
+import itertools
+import json
+import operator
+import os
+import re
+
+import build_cache
+from posts import load_post
+
+# --- CONFIGURATION ---
+SEARCH_DIR = "docs/blog/search"
+# Not a valid term prefix, so it can never clash with a shard
+META_FILE = "_index.json"
+
+# Bump whenever tokenizing, scoring or the cache layout changes, so the
+# cached index is rebuilt
+INDEX_VERSION = "2"
+
+# Terms are sharded by prefix, starting with their first character; a shard
+# larger than this is split by one more character. A query only fetches the
+# shards its words fall into.
+SHARD_TARGET_BYTES = 8192
+
+# How much one occurrence of a term counts, by where it appears
+FIELD_WEIGHTS = {"title": 8, "tags": 5, "challenge": 3, "body": 1}
+
+TERM_RE = re.compile(r"[a-z0-9]{2,24}")
+# Markup that should not contribute terms: image embeds, link targets and HTML tags
+NOISE_RE = re.compile(r"!\[\[.*?\]\]|\]\([^)]*\)|<[^>]+>|https?://\S+")
+
+STOP_WORDS = frozenset("""
+    an and are as at be but by can do for from has have if in into is it its
+    of on or so that the then there these this to was we were will with you your
+""".split())
+
+
+def tokenize(text):
+    """Returns the index terms of a piece of text, in order."""
+    return [t for t in TERM_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def post_terms(post):
+    """Returns {term: score} for one post with its body loaded."""
+    fields = {
+        "title": post.title,
+        "tags": " ".join(post.tags),
+        "challenge": " ".join(post.challenge.values()),
+        "body": NOISE_RE.sub(" ", post.body or ""),
+    }
+    scores = {}
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for term in tokenize(text):
+            scores[term] = scores.get(term, 0) + weight
+    return scores
+
+
+def to_base36(n):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+
+# Gaps and scores are nearly always small; common terms have postings for
+# most posts, and are re-encoded whenever any of those posts changes
+_SMALL_BASE36 = [to_base36(n) for n in range(36 * 36)]
+
+
+def _base36(n):
+    return _SMALL_BASE36[n] if n < len(_SMALL_BASE36) else to_base36(n)
+
+
+def encode_postings(postings):
+    """Packs [(doc_id, score), ...] sorted by doc id into a compact string:
+    doc-id gaps and scores alternate, in base 36, separated by commas.
+    """
+    doc_ids = [doc_id for doc_id, _ in postings]
+    nums = [0] * (2 * len(doc_ids))
+    nums[::2] = map(operator.sub, doc_ids, [0] + doc_ids[:-1])
+    nums[1::2] = [score for _, score in postings]
+    try:
+        return ",".join(map(_SMALL_BASE36.__getitem__, nums))
+    except IndexError:
+        return ",".join(map(_base36, nums))
+
+
+def decode_postings(encoded):
+    """Unpacks encode_postings() output into {doc_id: score}."""
+    nums = encoded.split(",") if encoded else []
+    return dict(zip(itertools.accumulate(map(int, nums[::2], itertools.repeat(36))),
+                    map(int, nums[1::2], itertools.repeat(36))))
+
+
+def _share(term, encoded):
+    # A term's part of its shard's JSON, "term":"postings" plus a comma
+    return len(term) + len(encoded) + 6
+
+
+def shard_layout(terms, offsets, lo=0, hi=None, prefix_length=1, layout=None):
+    """Splits sorted `terms` into shards keyed by term prefix and returns
+    {prefix: (start, end)}, each shard being terms[start:end]. `offsets`
+    are the running totals of the terms' _share()s.
+
+    Shards start from each term's first character; a shard whose JSON would
+    be over SHARD_TARGET_BYTES is split on a longer prefix, and a term
+    shorter than the prefix keeps a shard of its own, named after the whole
+    term. Only shard sizes are computed, so the layout costs nothing like
+    encoding the shards.
+    """
+    hi = len(terms) if hi is None else hi
+    layout = {} if layout is None else layout
+    i = lo
+    while i < hi:
+        prefix = terms[i][:prefix_length]
+        if len(prefix) < prefix_length:
+            # Sorted terms put a term before the longer ones it starts
+            j = i + 1
+        else:
+            # "{" sorts after every character a term can have
+            j = bisect.bisect_left(terms, prefix + "{", i, hi)
+        size = offsets[j] - offsets[i] + 1
+        if size > SHARD_TARGET_BYTES and (j - i > 1 or len(terms[i]) > prefix_length):
+            shard_layout(terms, offsets, i, j, prefix_length + 1, layout)
+        else:
+            layout[prefix] = (i, j)
+        i = j
+    return layout
+
+
+def empty_cache():
+    """Returns an empty search cache (the manifest's "search" section)."""
+    return {"version": INDEX_VERSION, "posts": {}, "postings": {}, "shards": {}}
+
+
+def build_search_index(posts, cache, file_cache, search_dir=SEARCH_DIR, sources=None, terms=None):
+    """Writes the sharded search index for `posts` (in listing order, newest
+    first), updating it from the last build's.
+
+    `cache` (the manifest's "search" section) keeps each post's doc id and
+    term scores, the encoded postings of every term, and the shards written
+    with the first and last term in each. Only posts whose source changed
+    are tokenized again, and only the shards holding a term whose postings
+    changed are encoded and written; shards for prefixes that no longer
+    occur are removed. `sources`, when given, are the only posts whose
+    source may have changed; the others aren't even checked. `terms` maps
+    posts the caller has already read to their post_terms(), so those
+    aren't read again. Returns the number of files written.
+    """
+    os.makedirs(search_dir, exist_ok=True)
+    if cache.get("version") != INDEX_VERSION:
+        cache.clear()
+        cache.update(empty_cache())
+    entries = cache["posts"]
+    postings = cache["postings"]
+
+    # Doc ids are kept for as long as a post exists, so changing, adding or
+    # removing one post leaves the postings of the others untouched. New
+    # posts are numbered oldest first after the existing ones.
+    updates = {}
+    next_doc = max((entry["doc"] for entry in entries.values()), default=-1) + 1
+    for post in reversed(posts):
+        entry = entries.get(post.source)
+        if entry and sources is not None and post.source not in sources:
+            continue
+        source_digest = build_cache.file_digest(post.path, file_cache)
+        if entry and entry["source"] == source_digest:
+            continue
+        if terms and post.source in terms:
+            scores = terms[post.source]
+        else:
+            scores = post_terms(post if post.body is not None else load_post(post.source))
+        if entry:
+            doc_id = entry["doc"]
+            for term in entry["terms"]:
+                updates.setdefault(term, {})[doc_id] = None
+        else:
+            doc_id = next_doc
+            next_doc += 1
+        for term, score in scores.items():
+            updates.setdefault(term, {})[doc_id] = score
+        entries[post.source] = {"source": source_digest, "doc": doc_id, "terms": scores}
+
+    live = {post.source for post in posts}
+    for source in list(entries):
+        if source not in live:
+            for term in entries[source]["terms"]:
+                updates.setdefault(term, {})[entries[source]["doc"]] = None
+            del entries[source]
+
+    for term, changes in updates.items():
+        merged = decode_postings(postings.get(term, ""))
+        for doc_id, score in changes.items():
+            if score is None:
+                merged.pop(doc_id, None)
+            else:
+                merged[doc_id] = score
+        if merged:
+            postings[term] = encode_postings(sorted(merged.items()))
+        else:
+            postings.pop(term, None)
+
+    shards = cache["shards"]
+    missing = {prefix for prefix in shards if not os.path.exists(os.path.join(search_dir, f"{prefix}.json"))}
+    written = 0
+    if updates or missing:
+        written += _write_shards(postings, shards, sorted(updates), missing, search_dir)
+    else:
+        build_cache.add_output_counts({"unchanged": len(shards)})
+
+    docs = [None] * next_doc
+    for post in posts:
+        docs[entries[post.source]["doc"]] = [post.title, post.url, post.date]
+    while docs and docs[-1] is None:
+        docs.pop()
+    # blog.js drops stop words from queries too, so they match nothing here
+    meta = {"docs": docs, "shards": {prefix: shard[0] for prefix, shard in shards.items()},
+            "stop_words": sorted(STOP_WORDS)}
+    written += build_cache.write_if_changed(os.path.join(search_dir, META_FILE), json.dumps(meta, separators=(",", ":"), sort_keys=True))
+
+    for filename in os.listdir(search_dir):
+        prefix = filename[:-len(".json")]
+        if filename.endswith(".json") and filename != META_FILE and prefix not in shards:
+            build_cache.remove_output(os.path.join(search_dir, filename))
+
+    return written
+
+
+def _write_shards(postings, shards, changed, missing, search_dir):
+    """Lays out the shards again and writes the ones holding a `changed`
+    term (sorted), the `missing` ones and new ones, updating `shards`
+    ({prefix: [version, first term, last term]}). Returns the number of
+    files written.
+    """
+    terms = sorted(postings)
+    offsets = [0]
+    for term in terms:
+        offsets.append(offsets[-1] + _share(term, postings[term]))
+    layout = shard_layout(terms, offsets)
+
+    written = 0
+    for prefix, (start, end) in layout.items():
+        first, last = terms[start], terms[end - 1]
+        # Terms added to or dropped from a shard are changed terms too, so
+        # a shard with none between its first and last term is unchanged
+        k = bisect.bisect_left(changed, first)
+        touched = k < len(changed) and changed[k] <= last
+        if shards.get(prefix, [None])[1:] == [first, last] and not touched and prefix not in missing:
+            build_cache.add_output_counts({"unchanged": 1})
+            continue
+        text = json.dumps({term: postings[term] for term in terms[start:end]}, separators=(",", ":"), sort_keys=True)
+        # Clients add the version to shard URLs so cached shards are refreshed
+        shards[prefix] = [build_cache.hash_bytes(text.encode("utf-8"))[:8], first, last]
+        written += build_cache.write_if_changed(os.path.join(search_dir, f"{prefix}.json"), text)
+
+    for prefix in list(shards):
+        if prefix not in layout:
+            del shards[prefix]
+    return written
@@ -0,0 +1,174 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Recording is off unless enable() is called; span() then hands out a shared
+# no-op context manager, so instrumented code costs one function call.
+_recorder = None
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Recorder:
+    """Collects finished spans for one process."""
+
+    def __init__(self):
+        self.events = []
+        self.local = threading.local()
+
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+
+def enable():
+    """Starts recording spans in this process."""
+    global _recorder
+    _recorder = Recorder()
+
+
+def init_worker(enabled):
+    """ProcessPoolExecutor initializer mirroring the parent's setting."""
+    if enabled:
+        enable()
+
+
+def enabled():
+    return _recorder is not None
+
+
+@contextlib.contextmanager
+def _span(name, post):
+    stack = _recorder.stack()
+    if post is None and stack:
+        post = stack[-1]["post"]
+    event = {
+        "name": name,
+        "post": post,
+        # The outermost span of a post is what its total is made of
+        "top": post is not None and all(parent["post"] != post for parent in stack),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": {},
+    }
+    stack.append(event)
+    cpu = time.process_time_ns()
+    event["ts"] = time.perf_counter_ns()
+    try:
+        yield event
+    finally:
+        event["dur"] = time.perf_counter_ns() - event["ts"]
+        event["cpu"] = time.process_time_ns() - cpu
+        stack.pop()
+        _recorder.events.append(event)
+
+
+def span(name, post=None):
+    """Times a stage of the build. `post` names the post the work is for;
+    nested spans inherit it from their parent.
+    """
+    if _recorder is None:
+        return _NULL_SPAN
+    return _span(name, post)
+
+
+def add(counter, amount=1):
+    """Adds to a counter (bytes_read, bytes_written, cache_hit, cache_miss)
+    of the innermost open span.
+    """
+    if _recorder is None:
+        return
+    stack = _recorder.stack()
+    if stack:
+        args = stack[-1]["args"]
+        args[counter] = args.get(counter, 0) + amount
+
+
+def drain():
+    """Returns and forgets the spans recorded so far, for sending back from
+    a worker process.
+    """
+    if _recorder is None:
+        return []
+    events, _recorder.events = _recorder.events, []
+    return events
+
+
+def merge(events):
+    """Adds spans recorded in a worker process."""
+    if _recorder is not None:
+        _recorder.events.extend(events)
+
+
+def stage_totals(events):
+    """Returns {stage: totals} aggregated over all spans of each name."""
+    totals = {}
+    for event in events:
+        total = totals.setdefault(event["name"], {"calls": 0, "wall": 0, "cpu": 0})
+        total["calls"] += 1
+        total["wall"] += event["dur"]
+        total["cpu"] += event["cpu"]
+        for counter, amount in event["args"].items():
+            total[counter] = total.get(counter, 0) + amount
+    return totals
+
+
+def post_totals(events):
+    """Returns {post: wall ns} summed over each post's outermost spans."""
+    totals = {}
+    for event in events:
+        if event["top"]:
+            totals[event["post"]] = totals.get(event["post"], 0) + event["dur"]
+    return totals
+
+
+def print_summary(top=10):
+    """Prints per-stage totals and the `top` slowest posts."""
+    if _recorder is None:
+        return
+    events = _recorder.events
+
+    print("\nBuild profile")
+    print(f"  {'stage':<26}{'calls':>7}{'wall ms':>11}{'cpu ms':>10}{'read KB':>10}{'written KB':>12}{'cache hit/miss':>16}")
+    for name, total in sorted(stage_totals(events).items(), key=lambda item: -item[1]["wall"]):
+        cache = ""
+        if "cache_hit" in total or "cache_miss" in total:
+            cache = f"{total.get('cache_hit', 0)}/{total.get('cache_miss', 0)}"
+        print(f"  {name:<26}{total['calls']:>7}{total['wall'] / 1e6:>11.1f}{total['cpu'] / 1e6:>10.1f}"
+              f"{total.get('bytes_read', 0) / 1024:>10.1f}{total.get('bytes_written', 0) / 1024:>12.1f}{cache:>16}")
+
+    slowest = sorted(post_totals(events).items(), key=lambda item: -item[1])[:top]
+    if slowest:
+        print(f"\nSlowest {len(slowest)} post(s)")
+        for post, wall in slowest:
+            print(f"  {wall / 1e6:>9.1f} ms  {post}")
+
+
+def write_trace(path):
+    """Writes the recorded spans as a Chrome trace-event file, viewable in
+    chrome://tracing or Perfetto.
+    """
+    if _recorder is None:
+        return
+    events = _recorder.events
+    start = min((event["ts"] for event in events), default=0)
+    trace = []
+    for event in events:
+        args = dict(event["args"], cpu_ms=round(event["cpu"] / 1e6, 3))
+        if event["post"] is not None:
+            args["post"] = event["post"]
+        trace.append({
+            "name": event["name"],
+            "cat": "post" if event["post"] is not None else "build",
+            "ph": "X",
+            "ts": (event["ts"] - start) / 1000,
+            "dur": event["dur"] / 1000,
+            "pid": event["pid"],
+            "tid": event["tid"],
+            "args": args,
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+    print(f"Wrote trace to {path}")
@@ -1,115 +1,226 @@
 #!/usr/bin/env python3
 import os
-import re
-from datetime import datetime
 
-SRC_DIR = "blog-src"
+import assets
+import build_cache
+import critical_css
+import icons
+from catalogue import Catalogue
+
 DEST_DIR = "docs/blog"
 BLOG_INDEX_FILE = os.path.join(DEST_DIR, "index.html")
+TEMPLATE_DIR = "scripts"
+TEMPLATE_NAME = "blog_index_template.html"
+
+# Posts per listing page
+PAGE_SIZE = 12
+
+# Bump whenever a change to this script alters the listing pages, so
+# cached pages from older builds are re-rendered
+INDEX_VERSION = "1"
+
+# Archive sections, each a directory of listing pages under DEST_DIR. Pages
+# past the first of the main listing live in "page".
+ARCHIVE_SECTIONS = {"tags": "Tag", "difficulty": "Difficulty"}
+PAGES_SECTION = "page"
+
+# Context every listing page shares; it is covered by the "static" and
+# "archives" dependencies
+SHARED_CONTEXT = ("static", "tags", "difficulties")
+
+# Stand in for a page's critical CSS and icon sprite until they are known
+CRITICAL_CSS_MARKER = "/*critical-css*/"
+ICON_SPRITE_MARKER = "<!--icon-sprite-->"
+
+
+_template = None
+
+
+def get_template():
+    """Returns the listing page template, loading it once per process."""
+    global _template
+    if _template is None:
+        env = build_cache.template_environment(TEMPLATE_DIR, keep_trailing_newline=True)
+        _template = env.get_template(TEMPLATE_NAME)
+    return _template
+
+
+def page_urls(section, slug, count):
+    """Returns the URLs, relative to the blog root, of a listing's pages."""
+    pages = max(1, -(-count // PAGE_SIZE))
+    if section is None:
+        return ["index.html"] + [f"{PAGES_SECTION}/{n}.html" for n in range(2, pages + 1)]
+    # Slugs never contain dots, so "<slug>.<n>" can't clash with another slug
+    return [f"{section}/{slug}.html"] + [f"{section}/{slug}.{n}.html" for n in range(2, pages + 1)]
+
+
+def listing_pages(catalogue, static):
+    """Returns (url, query, context) for every listing page: the paginated
+    main index, then the tag and difficulty archives. The context lacks
+    the page's posts, which are the catalogue's posts(*query). `static`
+    maps static assets to their fingerprinted paths (see
+    assets.fingerprint_static).
+    """
+    archives = {section: catalogue.archives(section) for section in ARCHIVE_SECTIONS}
+    shared = {
+        section: [
+            {"name": name, "slug": slug, "count": count, "url": page_urls(section, slug, 1)[0]}
+            for slug, name, count in groups
+        ]
+        for section, groups in archives.items()
+    }
+
+    listings = [(None, None, None, catalogue.count())]
+    for section, groups in archives.items():
+        for slug, name, count in groups:
+            listings.append((section, slug, f"{ARCHIVE_SECTIONS[section]}: {name}", count))
+
+    for section, slug, heading, count in listings:
+        urls = page_urls(section, slug, count)
+        for page, url in enumerate(urls, start=1):
+            yield url, (section, slug, (page - 1) * PAGE_SIZE, PAGE_SIZE), {
+                "root": "../" if "/" in url else "",
+                "heading": heading,
+                "posts_total": count,
+                "page": page,
+                "pages": len(urls),
+                "page_urls": urls,
+                "tags": shared["tags"],
+                "difficulties": shared["difficulty"],
+                "static": static,
+            }
 
 
-def extract_metadata(markdown_content):
-    meta = {}
-    lines = markdown_content.splitlines()
-    meta_re = re.compile(r'^(Title|Date|Author|Tags|Read_time)\s*:\s*(.*)$', re.IGNORECASE)
-    remaining = []
-    for line in lines:
-        m = meta_re.match(line.strip())
-        if m:
-            key = m.group(1).strip().lower()
-            val = m.group(2).strip().strip('"')
-            if key == 'tags':
-                v = val
-                if v.startswith('[') and v.endswith(']'):
-                    v = v[1:-1]
-                meta['tags'] = [t.strip() for t in re.split(r',\s*', v) if t.strip()]
-            else:
-                meta[key] = val
-        else:
-            remaining.append(line)
-    return meta
-
-
-def try_parse_date(d):
-    if not d:
-        return datetime.min
-    fmts = ["%B %d, %Y", "%Y-%m-%d", "%d %B %Y", "%b %d, %Y"]
-    for f in fmts:
-        try:
-            return datetime.strptime(d, f)
-        except Exception:
+def page_dependencies(context, versions, shared):
+    """Returns what a listing page depends on, by name (see
+    build_cache.explain_changes): the `shared` inputs of every page
+    (archive links included), the page's own navigation (heading and
+    paging) and each post it lists, by rank, digest and read time.
+    """
+    navigation = {name: value for name, value in context.items() if name not in SHARED_CONTEXT}
+    return dict(
+        shared,
+        navigation=build_cache.hash_parts(navigation),
+        post={source: [rank, digest, read_time] for rank, (source, digest, read_time) in enumerate(versions)},
+    )
+
+
+def stale_listings(catalogue, recorded, shared):
+    """Returns a test telling, from a page's catalogue query, whether the
+    page may have changed since the last build, or None when every page
+    has to be checked.
+
+    When nothing shared by all pages changed (`recorded` holds the index
+    page's dependencies from the last build), the posts are the same ones
+    in the same archives, and only the posts changed since the listings
+    were last rendered (see Catalogue.changed_since_listed) matter: the
+    archives listing them, and the main index pages between the first
+    and last rank one of them holds or held (which is about one page
+    when a post is edited without changing its date).
+    """
+    if not recorded or build_cache.explain_changes({name: recorded.get(name) for name in shared}, shared):
+        return None
+    changed = catalogue.changed_since_listed()
+    if not changed:
+        return lambda query: False
+    archives = catalogue.archives_of(source for source, _, _ in changed)
+    # Ordered as listed: newest first, then by source. Old dates are ranked
+    # among today's posts, which is off by at most one per changed post;
+    # a post without a recorded date may have been anywhere after its rank.
+    ranks = [catalogue.rank(sort_date, source) if sort_date else float("inf")
+             for source, new_date, old_date in changed for sort_date in (new_date, old_date)]
+    first, last = min(ranks), max(ranks) + len(changed)
+
+    def stale(query):
+        section, slug, offset, limit = query
+        if section is None:
+            return offset <= last and offset + limit > first
+        return (section, slug) in archives
+
+    return stale
+
+
+def update_blog_index(catalogue, static, manifest, explain=False):
+    """Renders the blog listing pages from the post catalogue: the
+    paginated index plus per-tag and per-difficulty archives. `static`
+    maps static assets to their fingerprinted paths.
+    A page is only rendered when something it depends on changed since
+    the last build (as recorded in the manifest; `explain` prints what),
+    and archive pages that are no longer produced are removed. Pages no
+    changed post can appear on are skipped without querying their posts
+    (see stale_listings).
+    """
+    template = get_template()
+    template_path = os.path.join(TEMPLATE_DIR, TEMPLATE_NAME)
+    shared = {
+        "index": INDEX_VERSION,
+        "template": {template_path: build_cache.file_digest(template_path, manifest["files"])},
+        "icons": icons.icon_set_digest(manifest["files"]),
+        "static": static,
+    }
+
+    pages = list(listing_pages(catalogue, static))
+    # Every page links to every archive, with its post count
+    index_context = pages[0][2]
+    shared["archives"] = build_cache.hash_parts(index_context["tags"], index_context["difficulties"],
+                                                index_context["posts_total"])
+
+    cache = manifest["listings"]
+    stale = stale_listings(catalogue, cache.get(BLOG_INDEX_FILE), shared)
+    generated = set()
+    written = 0
+    for url, query, context in pages:
+        path = os.path.join(DEST_DIR, url)
+        generated.add(path)
+        if stale and not stale(query) and path in cache and os.path.exists(path):
+            build_cache.add_output_counts({"unchanged": 1})
+            continue
+        # The page's posts are only loaded when it has to be rendered
+        deps = page_dependencies(context, catalogue.versions(*query), shared)
+        reasons = build_cache.explain_changes(cache.get(path), deps, [path])
+        if not reasons:
+            build_cache.add_output_counts({"unchanged": 1})
             continue
-    m = re.search(r"(19|20)\d{2}", d)
-    if m:
-        try:
-            return datetime(int(m.group(0)), 1, 1)
-        except Exception:
-            return datetime.min
-    return datetime.min
-
-
-def build_posts_list():
-    md_files = [f for f in os.listdir(SRC_DIR) if f.endswith('.md') and 'template' not in f.lower() and not f.startswith('.')]
-    posts = []
-    for md in md_files:
-        path = os.path.join(SRC_DIR, md)
-        with open(path, 'r', encoding='utf-8') as fh:
-            content = fh.read()
-        meta = extract_metadata(content)
-        title = meta.get('title') or (re.search(r'^#\s+(.*)', content, re.MULTILINE) and re.search(r'^#\s+(.*)', content, re.MULTILINE).group(1)) or os.path.splitext(md)[0]
-        date = meta.get('date','')
-        author = meta.get('author','')
-        tags = meta.get('tags',[])
-        read_time = meta.get('read_time', '')
-        posts.append({
-            'title': title,
-            'url': f'html/{os.path.splitext(md)[0]}.html',
-            'date': date,
-            'author': author,
-            'tags': tags,
-            'read_time': read_time
-        })
-    posts.sort(key=lambda p: try_parse_date(p.get('date','')), reverse=True)
-    return posts
-
-
-def update_index(posts):
-    with open(BLOG_INDEX_FILE, 'r', encoding='utf-8') as f:
-        html = f.read()
-
-    post_list_html = ''
-    for post in posts:
-        tags_html = ''
-        if post.get('tags'):
-            tags_html = ' '.join([f"<span class=\"tag tag-{t.lower().replace(' ','-')}\">{t}</span>" for t in post.get('tags')])
-        post_list_html += f'''\n            <article class="blog-card"> 
-                <a href="{post['url']}" class="blog-card-content"> 
-                    <div class="blog-card-date"><i class="fas fa-calendar-alt"></i> {post.get('date','')}</div>
-                    <h2 class="blog-card-title">{post.get('title','')}</h2>
-                    <div style="display:flex;gap:0.75rem;align-items:center;margin-top:0.5rem;flex-wrap:wrap;"> 
-                        <span class="blog-meta"><i class="fas fa-clock"></i> {post.get('read_time','')} </span>
-                        <span class="blog-meta"><i class="fas fa-user"></i> {post.get('author','')}</span>
-                        <span style="margin-left:0.25rem;">{tags_html}</span>
-                    </div>
-                </a>
-            </article>'''
-
-    start_tag_re = re.search(r'<section[^>]*class=["\'][^"\']*blog-grid[^"\']*["\'][^>]*>', html)
-    if not start_tag_re:
-        print('blog-grid section not found in index.html')
-        return
-    start_index = start_tag_re.end()
-    end_index = html.find('</section>', start_index)
-    if end_index == -1:
-        print('closing </section> not found')
-        return
-
-    new_html = html[:start_index] + '\n' + post_list_html + html[end_index:]
-    with open(BLOG_INDEX_FILE, 'w', encoding='utf-8') as f:
-        f.write(new_html)
-    print('Updated', BLOG_INDEX_FILE)
+        if explain:
+            print(f"Rendering {path}\n    because: {'; '.join(reasons)}")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Listing pages are small, so the page is rendered once and its
+        # icon sprite and critical CSS put in afterwards
+        html = template.render(critical_css=CRITICAL_CSS_MARKER, icon_sprite=ICON_SPRITE_MARKER,
+                               posts=catalogue.posts(*query), **context)
+        sprite = icons.sprite(icons.used_icons(html))
+        html = icons.rewrite(html).replace(ICON_SPRITE_MARKER, sprite, 1)
+        html = html.replace(CRITICAL_CSS_MARKER, critical_css.extract([html]), 1)
+        written += build_cache.write_if_changed(path, html)
+        cache[path] = deps
+
+    catalogue.mark_listed()
+    for path in list(cache):
+        if path not in generated:
+            del cache[path]
+
+    for section in [PAGES_SECTION, *ARCHIVE_SECTIONS]:
+        section_dir = os.path.join(DEST_DIR, section)
+        if not os.path.isdir(section_dir):
+            continue
+        for filename in os.listdir(section_dir):
+            path = os.path.join(section_dir, filename)
+            if filename.endswith(".html") and path not in generated:
+                build_cache.remove_output(path)
+
+    if written:
+        print(f"Updated blog index at {BLOG_INDEX_FILE} ({written} of {len(generated)} listing page(s) rewritten)")
 
 
 if __name__ == '__main__':
-    posts = build_posts_list()
-    update_index(posts)
+    # Reuse the converter's manifest and catalogue so unchanged posts keep
+    # the read time computed from their rendered pages. Posts edited since
+    # are listed from their headers, without a read time until they are
+    # converted.
+    manifest = build_cache.load_manifest()
+    catalogue = Catalogue()
+    catalogue.sync(manifest["files"])
+    update_blog_index(catalogue, assets.fingerprint_static(manifest["files"]), manifest)
+    catalogue.close()
+    build_cache.save_manifest(manifest)
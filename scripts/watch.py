@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Rebuilds the blog while you write and serves docs/ with live reload.
+
+Run from the repository root:
+
+    python scripts/watch.py [--port 8000]
+
+Changes under blog-src/, to the page templates, the vendored icons and the
+blog's CSS and JavaScript trigger an incremental build. The manifest,
+catalogue and templates stay in memory between builds, and each build is
+told which files changed: when those are only posts and images, just the
+pages they appear on (the posts themselves, the pages with them in their
+sidebar, their listing pages and search shards) are checked and
+rewritten. Pages served by the preview server reload themselves once the
+build finishes; the manifest is saved right after.
+"""
+import argparse
+import os
+import threading
+import time
+import traceback
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import assets
+import convert_writeups
+import icons
+import update_blog_index
+
+# --- CONFIGURATION ---
+SRC_DIR = convert_writeups.SRC_DIR
+TEMPLATE_PATH = os.path.join(convert_writeups.TEMPLATE_DIR, convert_writeups.TEMPLATE_NAME)
+INDEX_TEMPLATE_PATH = os.path.join(update_blog_index.TEMPLATE_DIR, update_blog_index.TEMPLATE_NAME)
+# Pages link to fingerprinted copies of these, so editing one needs a build
+STATIC_PATHS = [os.path.join(assets.STATIC_DIR, path) for path in assets.STATIC_FILES]
+SERVE_DIR = "docs"
+
+# How often the watched files are polled, and how long they must be quiet
+# before a build starts (editors often write a file in several steps).
+POLL_INTERVAL = 0.2
+SETTLE_TIME = 0.1
+
+RELOAD_PATH = "/__reload"
+RELOAD_SCRIPT = (
+    f'<script>new EventSource("{RELOAD_PATH}").onmessage = function () {{ location.reload(); }};</script>'
+)
+
+
+def snapshot():
+    """Returns {path: (mtime_ns, size)} for every watched file."""
+    state = {}
+    for root, _, files in (*os.walk(SRC_DIR), *os.walk(icons.ICON_DIR)):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # removed while walking
+            state[path] = (st.st_mtime_ns, st.st_size)
+    for path in (TEMPLATE_PATH, INDEX_TEMPLATE_PATH, *STATIC_PATHS):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue  # being saved by deleting and rewriting it; shows up as a change
+        state[path] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+def changed_paths(before, after):
+    """Returns the paths that were added, removed or modified."""
+    return {path for path in before.keys() | after.keys() if before.get(path) != after.get(path)}
+
+
+class ReloadBroadcaster:
+    """Lets preview pages wait for the next finished build."""
+
+    def __init__(self):
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation, timeout):
+        """Blocks until a build newer than `generation` finishes or `timeout`
+        passes, and returns the current generation.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    """Serves docs/ and injects the live-reload script into HTML pages."""
+
+    def __init__(self, *args, broadcaster=None, **kwargs):
+        self.broadcaster = broadcaster
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path == RELOAD_PATH:
+            self.stream_reloads()
+            return
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and urlsplit(self.path).path.endswith("/"):
+            path = os.path.join(path, "index.html")
+        if not (path.endswith(".html") and os.path.isfile(path)):
+            # Includes directories without a trailing slash, which get redirected
+            super().do_GET()
+            return
+
+        with open(path, "rb") as f:
+            body = f.read()
+        script = RELOAD_SCRIPT.encode("utf-8")
+        if b"</body>" in body:
+            body = body.replace(b"</body>", script + b"</body>", 1)
+        else:
+            body += script
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        """Holds a server-sent events stream open, sending one message per build."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        generation = self.broadcaster.generation
+        try:
+            while True:
+                current = self.broadcaster.wait(generation, timeout=15)
+                # A comment line keeps idle connections open and notices closed tabs
+                self.wfile.write(b"data: reload\n\n" if current != generation else b": ping\n\n")
+                self.wfile.flush()
+                generation = current
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass  # the build output is the interesting part
+
+
+def build(paths, state):
+    """Runs an incremental build for a set of changed paths, with the
+    `state` kept across builds (see convert_writeups.build).
+    """
+    started = time.perf_counter()
+    if TEMPLATE_PATH in paths:
+        # get_template() caches the parsed template for the whole process
+        convert_writeups._template = None
+    if INDEX_TEMPLATE_PATH in paths:
+        update_blog_index._template = None
+    if any(os.path.dirname(path) == icons.ICON_DIR for path in paths):
+        # Loaded icons are cached the same way
+        icons._symbols.clear()
+    try:
+        convert_writeups.build(convert_writeups.parse_args([]), state, paths)
+    except Exception:
+        traceback.print_exc()
+        convert_writeups.discard_state(state)
+        print("Build failed; waiting for the next change")
+        return False
+    print(f"Rebuilt in {time.perf_counter() - started:.2f}s")
+    return True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the blog on change and serve docs/ with live reload.")
+    parser.add_argument("--host", default="127.0.0.1", help="address the preview server binds to")
+    parser.add_argument("--port", type=int, default=8000, help="port of the preview server")
+    parser.add_argument("--no-serve", action="store_true", help="only rebuild, without the preview server")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    broadcaster = ReloadBroadcaster()
+
+    # Bring the output up to date before watching for changes
+    build_state = {}
+    if build(set(), build_state):
+        convert_writeups.save_state(build_state)
+    state = snapshot()
+
+    if not args.no_serve:
+        handler = partial(PreviewHandler, directory=SERVE_DIR, broadcaster=broadcaster)
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Serving {SERVE_DIR} at http://{args.host}:{args.port}/blog/")
+
+    print(f"Watching {SRC_DIR}, {icons.ICON_DIR}, the templates and {', '.join(STATIC_PATHS)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(POLL_INTERVAL)
+            current = snapshot()
+            paths = changed_paths(state, current)
+            if not paths:
+                continue
+
+            # Wait until the editor has finished writing
+            time.sleep(SETTLE_TIME)
+            settled = snapshot()
+            while settled != current:
+                current = settled
+                time.sleep(SETTLE_TIME)
+                settled = snapshot()
+
+            paths = changed_paths(state, current)
+            state = current
+            for path in sorted(paths):
+                print(f"Changed: {path}")
+            if build(paths, build_state):
+                broadcaster.notify()
+                convert_writeups.save_state(build_state)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        # Whatever a build left unsaved goes
+        convert_writeups.discard_state(build_state)
+
+
+if __name__ == "__main__":
+    main()